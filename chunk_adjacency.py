@@ -0,0 +1,194 @@
+import sqlite3
+import threading
+from typing import Any, List, Optional, Tuple
+
+from langchain.schema import Document
+from logging_config import logger
+from chunk_store import chunk_field
+from utilities import config_section, shared_if_enabled
+
+adjacency_config = config_section("adjacency")
+
+
+class ChunkAdjacencyIndex:
+    """
+    Reading-order links between text chunks, persisted in SQLite.
+
+    Each row is keyed by (Source, PageNo, offset), where offset is the chunk's position on the
+    page, and holds the chunk id and the keys of the previous and next chunks in the document.
+    Links cross page boundaries, so walking a neighbor is a single primary-key lookup.
+    """
+
+    def __init__(self, index_path: str):
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(index_path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS adjacency (source TEXT, page_no INTEGER, offset INTEGER, chunk_id TEXT, "
+            "prev_page INTEGER, prev_offset INTEGER, next_page INTEGER, next_offset INTEGER, "
+            "PRIMARY KEY (source, page_no, offset)) WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    def next_offset(self, source: str, page_no: int) -> int:
+        """
+        Returns the offset the next chunk appended to a page will get.
+
+        Args:
+            source (str): The source file name.
+            page_no (int): The page number.
+
+        Returns:
+            int: The next free offset on the page.
+        """
+        with self._lock:
+            row = self.connection.execute("SELECT MAX(offset) FROM adjacency WHERE source = ? AND page_no = ?",
+                                          (source, page_no)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def append(self, source: str, page_no: int, start_offset: int, chunk_ids: List[str]) -> None:
+        """
+        Records a run of consecutive chunks on a page and links it to the chunks around it.
+
+        Args:
+            source (str): The source file name.
+            page_no (int): The page number.
+            start_offset (int): The offset of the first chunk, from `next_offset`.
+            chunk_ids (List[str]): The chunk ids in reading order.
+        """
+        if not chunk_ids:
+            return
+        end_offset = start_offset + len(chunk_ids) - 1
+        with self._lock:
+            previous = self.connection.execute(
+                "SELECT page_no, offset FROM adjacency WHERE source = ? AND (page_no, offset) < (?, ?) "
+                "ORDER BY page_no DESC, offset DESC LIMIT 1", (source, page_no, start_offset)
+            ).fetchone() or (None, None)
+            following = self.connection.execute(
+                "SELECT page_no, offset FROM adjacency WHERE source = ? AND (page_no, offset) > (?, ?) "
+                "ORDER BY page_no, offset LIMIT 1", (source, page_no, end_offset)
+            ).fetchone() or (None, None)
+
+            rows = []
+            for index, chunk_id in enumerate(chunk_ids):
+                offset = start_offset + index
+                prev_key = (page_no, offset - 1) if index > 0 else previous
+                next_key = (page_no, offset + 1) if offset < end_offset else following
+                rows.append((source, page_no, offset, chunk_id, *prev_key, *next_key))
+            self.connection.executemany("INSERT OR REPLACE INTO adjacency VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+            if previous[0] is not None:
+                self.connection.execute("UPDATE adjacency SET next_page = ?, next_offset = ? WHERE source = ? AND page_no = ? AND offset = ?",
+                                        (page_no, start_offset, source, *previous))
+            if following[0] is not None:
+                self.connection.execute("UPDATE adjacency SET prev_page = ?, prev_offset = ? WHERE source = ? AND page_no = ? AND offset = ?",
+                                        (page_no, end_offset, source, *following))
+            self.connection.commit()
+
+    def offset_of(self, source: str, page_no: int, chunk_id: str) -> Optional[int]:
+        """
+        Returns the offset of a chunk on a page, e.g. to re-home a deduplicated chunk to another occurrence.
+
+        Args:
+            source (str): The source file name.
+            page_no (int): The page number.
+            chunk_id (str): The chunk id.
+
+        Returns:
+            Optional[int]: The first offset of the chunk on the page, or None if it does not occur there.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT MIN(offset) FROM adjacency WHERE source = ? AND page_no = ? AND chunk_id = ?", (source, page_no, chunk_id)
+            ).fetchone()
+        return row[0]
+
+    def neighbors(self,source: str, page_no: int, offset: int, window: int) -> Tuple[List[str], List[str]]:
+        """
+        Walks up to `window` chunks before and after a chunk.
+
+        Args:
+            source (str): The source file name.
+            page_no (int): The page number of the chunk.
+            offset (int): The offset of the chunk on the page.
+            window (int): The maximum number of neighbors on each side.
+
+        Returns:
+            Tuple[List[str], List[str]]: The chunk ids before (nearest first) and after (nearest first).
+        """
+        sides = ([], [])
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT prev_page, prev_offset, next_page, next_offset FROM adjacency WHERE source = ? AND page_no = ? AND offset = ?",
+                (source, page_no, offset)
+            ).fetchone()
+            if row is None:
+                return sides
+            for ids, key, columns in ((sides[0], row[0:2], "chunk_id, prev_page, prev_offset"),
+                                      (sides[1], row[2:4], "chunk_id, next_page, next_offset")):
+                while key[0] is not None and len(ids) < window:
+                    step = self.connection.execute(
+                        f"SELECT {columns} FROM adjacency WHERE source = ? AND page_no = ? AND offset = ?", (source, *key)
+                    ).fetchone()
+                    if step is None:
+                        break
+                    ids.append(step[0])
+                    key = step[1:3]
+        return sides
+
+    def remove_source(self, source: str) -> None:
+        """
+        Removes all chunks of a source, e.g. when the document is deleted.
+
+        Args:
+            source (str): The source file name.
+        """
+        with self._lock:
+            self.connection.execute("DELETE FROM adjacency WHERE source = ?", (source,))
+            self.connection.commit()
+
+
+def expand_neighbors(vector_db: Any, documents: List[Any], window: int) -> List[Tuple[List[Document], List[Document]]]:
+    """
+    Looks up the neighboring chunks of each retrieved text chunk, fetching all of them in one call.
+
+    Args:
+        vector_db (Any): The vector store holding the chunks.
+        documents (List[Any]): The retrieved Documents or ChunkRecords.
+        window (int): The maximum number of neighbors on each side of a chunk.
+
+    Returns:
+        List[Tuple[List[Document], List[Document]]]: For each retrieved chunk, the chunks before and
+            after it, nearest first; empty for non-text chunks and chunks indexed without an offset.
+    """
+    adjacency_index = get_adjacency_index()
+    neighbor_ids = []
+    for document in documents:
+        offset = chunk_field(document, "ChunkOffset")
+        if adjacency_index is None or window < 1 or chunk_field(document, "Type") != "Text" or offset is None:
+            neighbor_ids.append(([], []))
+            continue
+        neighbor_ids.append(adjacency_index.neighbors(chunk_field(document, "Source"), chunk_field(document, "PageNo"), offset, window))
+
+    wanted = list(dict.fromkeys(chunk_id for before, after in neighbor_ids for chunk_id in before + after))
+    if not wanted:
+        return neighbor_ids
+
+    fetched = vector_db.get(ids=wanted)
+    by_id = {
+        chunk_id: Document(page_content=text, metadata=metadata)
+        for chunk_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])
+    }
+    return [
+        ([by_id[chunk_id] for chunk_id in before if chunk_id in by_id], [by_id[chunk_id] for chunk_id in after if chunk_id in by_id])
+        for before, after in neighbor_ids
+    ]
+
+
+def _open_adjacency_index() -> ChunkAdjacencyIndex:
+    index_path = adjacency_config.get("index_path", "chunk_adjacency.sqlite")
+    logger.info(f"Opening chunk adjacency index: {index_path}")
+    return ChunkAdjacencyIndex(index_path)
+
+
+# The shared chunk adjacency index, or None if it is disabled in config.json
+get_adjacency_index = shared_if_enabled(adjacency_config, _open_adjacency_index)
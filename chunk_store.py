@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from logging_config import logger
+from model_router import count_tokens
+from utilities import config_section, shared_if_enabled
+
+text_store_config = config_section("text_store")
+
+# Metadata keys and the ChunkRecord slots that hold them
+RECORD_FIELDS = {
+    "Source": "source",
+    "PageNo": "page_no",
+    "Type": "type",
+    "ImagePath": "image_path",
+    "SummaryStatus": "summary_status",
+    "TokenCount": "token_count",
+    "ChunkOffset": "chunk_offset",
+}
+
+
+class ChunkTextStore:
+    """
+    Side store holding full chunk text by chunk id, in a memory-mapped SQLite file.
+
+    Retrieval can return compact ChunkRecords and pull text from here only for the chunks that
+    actually make it into the prompt.
+    """
+
+    def __init__(self, path: str, mmap_size_mb: int = 256):
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(f"PRAGMA mmap_size = {mmap_size_mb * 1024 * 1024}")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, text TEXT)")
+        self.connection.commit()
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        with self._lock:
+            self.connection.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?)", items)
+            self.connection.commit()
+
+    def get_text(self, chunk_id: str) -> Optional[str]:
+        with self._lock:
+            row = self.connection.execute("SELECT text FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, chunk_ids: List[str]) -> Dict[str, str]:
+        if not chunk_ids:
+            return {}
+        placeholders = ",".join("?" * len(chunk_ids))
+        with self._lock:
+            rows = self.connection.execute(f"SELECT chunk_id, text FROM chunks WHERE chunk_id IN ({placeholders})", chunk_ids).fetchall()
+        return dict(rows)
+
+    def missing(self, chunk_ids: List[str]) -> List[str]:
+        """
+        Returns the ids that have no text in the store, without loading any text.
+
+        Args:
+            chunk_ids (List[str]): The chunk ids to check.
+
+        Returns:
+            List[str]: The ids not in the store.
+        """
+        if not chunk_ids:
+            return []
+        placeholders = ",".join("?" * len(chunk_ids))
+        with self._lock:
+            present = {row[0] for row in self.connection.execute(
+                f"SELECT chunk_id FROM chunks WHERE chunk_id IN ({placeholders})", chunk_ids
+            ).fetchall()}
+        return [chunk_id for chunk_id in chunk_ids if chunk_id not in present]
+
+    def delete_many(self, chunk_ids: List[str]) -> None:
+        with self._lock:
+            self.connection.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self.connection.commit()
+
+
+class ChunkRecord:
+    """
+    Compact stand-in for a langchain Document on hot paths.
+
+    Holds only the fields retrieval and context building read, in slots instead of a metadata
+    dict; the chunk text is loaded from the ChunkTextStore on first access to `page_content`.
+    """
+
+    __slots__ = ("chunk_id", "source", "page_no", "type", "image_path", "summary_status", "token_count", "chunk_offset", "score", "_text", "_store")
+
+    def __init__(self, chunk_id: str, metadata: Dict[str, Any], score: float, store: ChunkTextStore):
+        self.chunk_id = chunk_id
+        for key, slot in RECORD_FIELDS.items():
+            setattr(self, slot, metadata.get(key))
+        self.score = score
+        self._text = None
+        self._store = store
+
+    @property
+    def page_content(self) -> str:
+        if self._text is None:
+            self._text = self._store.get_text(self.chunk_id) or ""
+        return self._text
+
+
+def chunk_field(chunk: Any, key: str) -> Any:
+    """
+    Reads a metadata field from either a ChunkRecord or a langchain Document.
+
+    Args:
+        chunk (Any): The ChunkRecord or Document.
+        key (str): The metadata key, e.g. "Source" or "PageNo".
+
+    Returns:
+        Any: The field value, or None if it is not set.
+    """
+    if isinstance(chunk, ChunkRecord):
+        return getattr(chunk, RECORD_FIELDS[key])
+    return chunk.metadata.get(key)
+
+
+def chunk_token_count(chunk: Any) -> int:
+    """
+    Returns the token count of a chunk, using the count recorded at ingestion when available so
+    that the text does not have to be loaded.
+
+    Args:
+        chunk (Any): The ChunkRecord or Document.
+
+    Returns:
+        int: The number of tokens in the chunk text.
+    """
+    token_count = chunk_field(chunk, "TokenCount")
+    return token_count if token_count is not None else count_tokens(chunk.page_content)
+
+
+def _open_text_store() -> ChunkTextStore:
+    path = text_store_config.get("path", "chunk_text.sqlite")
+    logger.info(f"Opening chunk text store: {path}")
+    return ChunkTextStore(path, text_store_config.get("mmap_size_mb", 256))
+
+
+# The shared chunk text store, or None if it is disabled in config.json
+get_text_store = shared_if_enabled(text_store_config, _open_text_store)
@@ -18,6 +18,7 @@
 
 #     except Exception as e:
 #         logger.error(f"Error processing Excel file {file_path}: {e}")
+import os
 import pandas as pd
 from logging_config import logger
 
@@ -31,9 +32,12 @@ def process_excel(file_path, vector_db, text_chunker):
 
         # Chunk the extracted text
         chunks = text_chunker.split_text(text_data)
+        # Source metadata lets delete_source_chunks find these chunks when the file changes or is removed
+        metadata = {"Source": os.path.basename(file_path), "PageNo": 1, "Type": "Text"}
         for i, chunk in enumerate(chunks):
-            vector_db.add(  # ✅ Using ChromaDB
+            vector_db.upsert(  # ✅ Using ChromaDB; replaces chunks indexed under the same id earlier
                 ids=[f"{file_path}_{i}"],  # Unique ID
+                metadatas=[metadata],
                 documents=[chunk]
             )
 
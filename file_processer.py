@@ -46,14 +46,49 @@
 
 
 import os
+from functools import partial
 import pandas as pd
 from logging_config import logger
 from pdf_processing import process_pdf
 from csv_processing import process_csv
 from excel_processing import process_excel
-from word_processing import process_word_text
+from word_processing import process_word_files, process_word_text
 from txt_processing import process_text
 from utilities import config
+from ingestion_scheduler import MemoryBudgetScheduler, MB
+from work_scheduler import work_slot
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.docx', '.csv', '.xls', '.xlsx')
+
+def process_file(file_path, vector_db, openai_client, model_name, text_chunker):
+    """
+    Processes a single supported file (PDF, TXT, Word, CSV, Excel) into the vector database.
+
+    The file holds an "ingest" slot of the work scheduler while it is processed.
+    """
+    filename = os.path.basename(file_path)
+    image_folder = config['settings']['image_directory_name']
+
+    if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        logger.warning(f"Unsupported file type: {filename}")
+        return
+
+    with work_slot("ingest"):
+        if filename.lower().endswith('.pdf'):
+            process_pdf(file_path, image_folder, vector_db, openai_client, model_name, text_chunker)
+
+        elif filename.lower().endswith('.txt'):
+            process_text(file_path, vector_db, text_chunker)
+
+        elif filename.lower().endswith('.docx'):
+            # A single document is parsed in the calling thread; a process pool only pays off for many
+            process_word_text(file_path, vector_db, text_chunker, image_folder, openai_client, model_name)
+
+        elif filename.lower().endswith('.csv'):
+            process_csv(file_path, vector_db, text_chunker)
+
+        elif filename.lower().endswith(('.xls', '.xlsx')):
+            process_excel(file_path, vector_db, text_chunker)
 
 def process_all_files(data_folder, vector_db, openai_client, model_name, text_chunker):
     """
@@ -63,29 +98,34 @@ def process_all_files(data_folder, vector_db, openai_client, model_name, text_ch
         logger.error(f"Data folder does not exist: {data_folder}")
         return
 
+    memory_budget_mb = config.get('ingestion', {}).get('memory_budget_mb')
+    if memory_budget_mb:
+        # Admit files to a worker pool only as far as the RSS budget allows
+        scheduler = MemoryBudgetScheduler(memory_budget_mb * MB, config['ingestion'].get('max_workers'))
+        scheduler.run([
+            (file_path, partial(process_file, file_path, vector_db, openai_client, model_name, text_chunker))
+            for file_path in (os.path.join(data_folder, filename) for filename in os.listdir(data_folder))
+            if file_path.lower().endswith(SUPPORTED_EXTENSIONS)
+        ])
+        logger.info("All files processed.")
+        return
+
+    image_folder = config['settings']['image_directory_name']
+    word_paths = []
+
     for filename in os.listdir(data_folder):
         file_path = os.path.join(data_folder, filename)
 
         try:
-            if filename.lower().endswith('.pdf'):
-                process_pdf(file_path, vector_db, openai_client, model_name, text_chunker)
-
-            elif filename.lower().endswith('.txt'):
-                process_text(file_path, vector_db, text_chunker)
-
-            elif filename.lower().endswith('.docx'):
-                process_word_text(file_path, vector_db, text_chunker)
-
-            elif filename.lower().endswith('.csv'):
-                process_csv(file_path, vector_db, text_chunker)
-
-            elif filename.lower().endswith(('.xls', '.xlsx')):
-                process_excel(file_path, vector_db, text_chunker)
-
+            if filename.lower().endswith('.docx'):
+                # Word documents are collected and parsed in parallel below
+                word_paths.append(file_path)
             else:
-                logger.warning(f"Unsupported file type: {filename}")
+                process_file(file_path, vector_db, openai_client, model_name, text_chunker)
 
         except Exception as e:
             logger.error(f"Error processing {filename}: {e}")
 
+    process_word_files(word_paths, vector_db, text_chunker, image_folder, openai_client, model_name)
+
     logger.info("All files processed.")
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from logging_config import logger
+from file_processer import SUPPORTED_EXTENSIONS, process_file
+from vector_database import delete_source_chunks
+from word_processing import process_word_files
+from utilities import config, config_section
+
+watcher_config = config_section("watcher")
+
+
+class DebouncedBatcher:
+    """
+    Collects file changes and hands them over in batches once the folder has been quiet for the
+    debounce interval (or the oldest pending change has waited for the maximum delay).
+
+    Only the latest action per path is kept, so a burst of writes to one file becomes one update.
+    """
+
+    def __init__(self, process_batch: Callable[[Dict[str, str]], None], debounce_seconds: float, max_delay_seconds: float):
+        self.process_batch = process_batch
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.pending = {}
+        self.first_pending_at = None
+        self.timer = None
+        self._lock = threading.Lock()
+        self._processing_lock = threading.Lock()
+
+    def schedule(self, path: str, action: str) -> None:
+        with self._lock:
+            self.pending[path] = action
+            now = time.monotonic()
+            if self.first_pending_at is None:
+                self.first_pending_at = now
+            if self.timer is not None:
+                self.timer.cancel()
+            delay = min(self.debounce_seconds, max(self.first_pending_at + self.max_delay_seconds - now, 0))
+            self.timer = threading.Timer(delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self) -> None:
+        # Batches are processed one at a time; changes arriving meanwhile form the next batch
+        with self._processing_lock:
+            with self._lock:
+                batch, self.pending = self.pending, {}
+                self.first_pending_at = None
+                self.timer = None
+            if batch:
+                self.process_batch(batch)
+
+    def stop(self) -> None:
+        with self._lock:
+            if self.timer is not None:
+                self.timer.cancel()
+        self.flush()
+
+
+class IngestionEventHandler(FileSystemEventHandler):
+    """
+    Turns filesystem events for supported documents into upsert/delete actions on a batcher.
+    """
+
+    def __init__(self, batcher: DebouncedBatcher):
+        self.batcher = batcher
+
+    @staticmethod
+    def _is_supported(path: str) -> bool:
+        filename = os.path.basename(path)
+        # Skip editor lock files and other temporaries written next to documents
+        return filename.lower().endswith(SUPPORTED_EXTENSIONS) and not filename.startswith(("~$", "."))
+
+    def on_created(self, event: Any) -> None:
+        if not event.is_directory and self._is_supported(event.src_path):
+            self.batcher.schedule(event.src_path, "upsert")
+
+    def on_modified(self, event: Any) -> None:
+        if not event.is_directory and self._is_supported(event.src_path):
+            self.batcher.schedule(event.src_path, "upsert")
+
+    def on_deleted(self, event: Any) -> None:
+        if not event.is_directory and self._is_supported(event.src_path):
+            self.batcher.schedule(event.src_path, "delete")
+
+    def on_moved(self, event: Any) -> None:
+        if event.is_directory:
+            return
+        if self._is_supported(event.src_path):
+            self.batcher.schedule(event.src_path, "delete")
+        if self._is_supported(event.dest_path):
+            self.batcher.schedule(event.dest_path, "upsert")
+
+
+def apply_file_changes(changes: Dict[str, str], vector_db: Any, openai_client: Any, model_name: str, text_chunker: Any) -> None:
+    """
+    Applies a batch of file changes to the vector database, touching only the affected sources.
+
+    Deleted files have their chunks removed; created or modified files have their old chunks
+    removed and are re-processed. Word documents in the batch are parsed in parallel.
+
+    Args:
+        changes (Dict[str, str]): A mapping of file path to "upsert" or "delete".
+        vector_db (Any): An instance of the vector database to update.
+        openai_client (Any): An instance of the OpenAI client to interact with the API.
+        model_name (str): The name of the OpenAI model to use for image summaries.
+        text_chunker (Any): An instance of the text splitter to use for splitting text.
+    """
+    logger.info(f"Applying batch of {len(changes)} file change(s)")
+    word_paths = []
+
+    for file_path, action in changes.items():
+        try:
+            delete_source_chunks(vector_db, file_path)
+            if action == "delete" or not os.path.isfile(file_path):
+                continue
+            if file_path.lower().endswith('.docx'):
+                word_paths.append(file_path)
+            else:
+                process_file(file_path, vector_db, openai_client, model_name, text_chunker)
+        except Exception as e:
+            logger.error(f"Error applying change to {os.path.basename(file_path)}: {e}")
+
+    process_word_files(word_paths, vector_db, text_chunker, config['settings']['image_directory_name'], openai_client, model_name)
+    logger.info("File change batch applied.")
+
+
+def watch_folder(data_folder: str, vector_db: Any, openai_client: Any, model_name: str, text_chunker: Any) -> None:
+    """
+    Watches a folder and keeps the vector database in sync with it until interrupted.
+
+    Args:
+        data_folder (str): The folder to watch.
+        vector_db (Any): An instance of the vector database to update.
+        openai_client (Any): An instance of the OpenAI client to interact with the API.
+        model_name (str): The name of the OpenAI model to use for image summaries.
+        text_chunker (Any): An instance of the text splitter to use for splitting text.
+    """
+    if not os.path.exists(data_folder):
+        logger.error(f"Data folder does not exist: {data_folder}")
+        return
+
+    batcher = DebouncedBatcher(
+        lambda changes: apply_file_changes(changes, vector_db, openai_client, model_name, text_chunker),
+        debounce_seconds=watcher_config.get("debounce_seconds", 2.0),
+        max_delay_seconds=watcher_config.get("max_batch_delay_seconds", 10.0),
+    )
+    observer = Observer()
+    observer.schedule(IngestionEventHandler(batcher), data_folder, recursive=False)
+    observer.start()
+    logger.info(f"Watching input folder for changes: {data_folder}")
+
+    try:
+        while observer.is_alive():
+            observer.join(timeout=1)
+    except KeyboardInterrupt:
+        logger.info("Stopping folder watcher.")
+    finally:
+        observer.stop()
+        observer.join()
+        batcher.stop()
@@ -1,8 +1,10 @@
 import base64
-from typing import Any
+import hashlib
+from typing import Any, Optional
 import os
 from utilities import config
 from utilities import logger
+from work_scheduler import work_slot
 def encode_image_base64(image_path: str) -> str:
     """
     Encodes an image file to a Base64 string.
@@ -28,7 +30,7 @@ def encode_image_base64(image_path: str) -> str:
         raise IOError(f"An error occurred while reading the image file: {e}")
     return encoded_image
 
-def image_summary_generator(encoded_image: str, model_name: str, openai_client: Any) -> str:
+def image_summary_generator(encoded_image: str, model_name: str, openai_client: Any, priority: Optional[str] = "ingest") -> str:
     """
     Generates a summary of an image using a specified OpenAI model.
 
@@ -36,6 +38,8 @@ def image_summary_generator(encoded_image: str, model_name: str, openai_client:
         encoded_image (str): The Base64 encoded image string.
         model_name (str): The name of the OpenAI model to use for generating the summary.
         openai_client (Any): An instance of the OpenAI client to interact with the API.
+        priority (Optional[str]): The work scheduler class the call runs under; None if the caller
+            already holds a scheduler slot.
 
     Returns:
         str: The generated summary of the image.
@@ -48,35 +52,69 @@ def image_summary_generator(encoded_image: str, model_name: str, openai_client:
         raise ValueError("The encoded image string cannot be empty.")
     try:
         # Create the model response
-        model_response = openai_client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert image analyst. Your task is to analyze the provided image and generate a detailed summary.The summary should include key elements such as the main subjects, actions, context, and notable features of the image.This summary should be concise yet informative, making it suitable for retrieval when answering user questions related to the image."
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Here is an image for you to summarize:"
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{encoded_image}"
+        with work_slot(priority):
+            model_response = openai_client.create_chat_completion(
+                model=model_name,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an expert image analyst. Your task is to analyze the provided image and generate a detailed summary.The summary should include key elements such as the main subjects, actions, context, and notable features of the image.This summary should be concise yet informative, making it suitable for retrieval when answering user questions related to the image."
+                    },
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": "Here is an image for you to summarize:"
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:image/png;base64,{encoded_image}"
+                                }
                             }
-                        }
-                    ]
-                }
-            ],
-            temperature=config["openai"]["temperature"],
-        )
+                        ]
+                    }
+                ],
+                temperature=config["openai"]["temperature"],
+            )
         # Check if the model response is valid
         if not model_response.choices or not model_response.choices[0].message.content:
             raise ValueError("Invalid response from the model.")
         image_summary = model_response.choices[0].message.content
     except Exception as e:
         raise Exception(f"An error occurred while generating the image summary: {e}")
-    return image_summary
\ No newline at end of file
+    return image_summary
+
+def cached_image_summary(encoded_image: str, model_name: str, openai_client: Any, priority: Optional[str] = "ingest") -> str:
+    """
+    Returns the summary of an image, generating it only if it is not already in the summary cache.
+
+    Summaries are cached on disk keyed by a hash of the encoded image and the model name, so the
+    same image embedded in several documents (or re-ingested) is only summarized once.
+
+    Args:
+        encoded_image (str): The Base64 encoded image string.
+        model_name (str): The name of the OpenAI model to use for generating the summary.
+        openai_client (Any): An instance of the OpenAI client to interact with the API.
+        priority (Optional[str]): The work scheduler class a summary generation runs under.
+
+    Returns:
+        str: The summary of the image.
+    """
+    cache_folder = config["settings"].get("image_summary_cache_directory_name", "image_summary_cache")
+    os.makedirs(cache_folder, exist_ok=True)
+    image_hash = hashlib.sha256(f"{model_name}:{encoded_image}".encode('utf-8')).hexdigest()
+    cache_path = os.path.join(cache_folder, f"{image_hash}.txt")
+
+    if os.path.isfile(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as cache_file:
+            logger.info(f"Using cached summary for image hash: {image_hash}")
+            return cache_file.read()
+
+    image_summary = image_summary_generator(encoded_image, model_name, openai_client, priority)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as cache_file:
+        cache_file.write(image_summary)
+    os.replace(temp_path, cache_path)
+    return image_summary
@@ -0,0 +1,348 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import tarfile
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import chromadb
+from logging_config import logger
+from chunk_store import get_text_store
+from chunk_adjacency import get_adjacency_index
+from near_duplicates import get_duplicate_index
+from utilities import config, config_section
+
+SNAPSHOT_FORMAT_VERSION = 2
+
+snapshot_config = config_section("snapshot")
+
+# SQLite side indexes carried in the snapshot, with the tables to merge on import
+SIDE_INDEXES = {
+    "adjacency": (get_adjacency_index, ("adjacency",)),
+    "deduplication": (get_duplicate_index, ("signatures", "buckets", "occurrences")),
+}
+
+
+def _add_bytes(archive: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    archive.addfile(info, io.BytesIO(data))
+
+
+def _add_checked(archive: tarfile.TarFile, name: str, data: bytes) -> None:
+    # Every data member is followed by its checksum so import can verify it while streaming
+    _add_bytes(archive, name, data)
+    _add_bytes(archive, f"{name}.sha256", hashlib.sha256(data).hexdigest().encode('utf-8'))
+
+
+def _iter_collection(collection: Any, batch_size: int) -> Iterator[Dict[str, List[Any]]]:
+    offset = 0
+    while True:
+        batch = collection.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            return
+        yield batch
+        offset += len(batch["ids"])
+
+
+def _sharding_layout() -> Optional[Dict[str, Any]]:
+    sharding = config["VectorDB"].get("sharding", {})
+    if not sharding.get("enabled", False):
+        return None
+    return {"strategy": sharding.get("strategy", "source"), "num_shards": sharding.get("num_shards", 8)}
+
+
+def _collection_names(client: Any, collection_name: str) -> List[str]:
+    # Sharded stores keep their chunks in "<name>_shard_N" or "<name>_YYYYMM" collections
+    if _sharding_layout() is None:
+        return [collection_name]
+    pattern = re.compile(rf"^{re.escape(collection_name)}_(shard_\d+|\d+)$")
+    names = (getattr(collection, "name", collection) for collection in client.list_collections())
+    return sorted(name for name in names if pattern.match(name))
+
+
+def _export_index(archive: tarfile.TarFile, name: str, index: Any) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, f"{name}.sqlite")
+        target = sqlite3.connect(path)
+        index.connection.backup(target)
+        target.close()
+        with open(path, 'rb') as file:
+            _add_checked(archive, f"indexes/{name}.sqlite", file.read())
+
+
+def _import_index(index: Any, data: bytes, tables: tuple) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "snapshot.sqlite")
+        with open(path, 'wb') as file:
+            file.write(data)
+        index.connection.execute("ATTACH DATABASE ? AS snapshot", (path,))
+        try:
+            for table in tables:
+                index.connection.execute(f"INSERT OR IGNORE INTO main.{table} SELECT * FROM snapshot.{table}")
+            index.connection.commit()
+        finally:
+            index.connection.execute("DETACH DATABASE snapshot")
+
+
+def _replace_collection(client: Any, staging_name: str, name: str) -> None:
+    # Same swap as ShardedVectorStore.rebuild_shard: drop the old copy, rename the complete one into place
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    client.get_collection(staging_name).modify(name=name)
+
+
+def _folder_files(folder: Optional[str]) -> Iterator[str]:
+    if folder and os.path.isdir(folder):
+        for filename in sorted(os.listdir(folder)):
+            if os.path.isfile(os.path.join(folder, filename)):
+                yield os.path.join(folder, filename)
+
+
+def export_snapshot(persist_directory: str, collection_name: str, snapshot_path: str, batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Exports a Chroma collection and its side files to a single compressed, checksummed snapshot.
+
+    The archive is a gzipped tar written as a stream: a header manifest, then chunk batches per
+    collection (ids, text, metadata and embeddings as JSON lines), cached image summaries, extracted
+    images, the enabled side indexes (chunk adjacency, near-duplicates), and finally the ingestion
+    manifest. Each data member is followed by a `.sha256` member. With sharding enabled, every
+    shard collection is exported and the layout is recorded in the header.
+
+    Args:
+        persist_directory (str): The Chroma persist directory.
+        collection_name (str): The name of the collection (or the shards' base name) to export.
+        snapshot_path (str): The path of the snapshot file to write.
+        batch_size (int): The number of chunks per batch member.
+
+    Returns:
+        Dict[str, Any]: The ingestion manifest written to the snapshot.
+    """
+    client = chromadb.PersistentClient(path=persist_directory)
+    collection_names = _collection_names(client, collection_name)
+    if not collection_names:
+        raise ValueError(f"No shard collections of '{collection_name}' found in: {persist_directory}")
+    summary_folder = config["settings"].get("image_summary_cache_directory_name", "image_summary_cache")
+    image_folder = config["settings"].get("image_directory_name")
+
+    header = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "collection_name": collection_name,
+        "embedding_model_name": config["VectorDB"].get("embedding_model_name"),
+        "chromadb_version": chromadb.__version__,
+        "sharding": _sharding_layout(),
+        "collections": collection_names,
+    }
+    sources = {}
+    collection_counts = {}
+    chunk_count = 0
+
+    logger.info(f"Exporting collection '{collection_name}' to snapshot: {snapshot_path}")
+    with tarfile.open(snapshot_path, "w|gz") as archive:
+        _add_bytes(archive, "header.json", json.dumps(header, indent=2).encode('utf-8'))
+
+        for name in collection_names:
+            collection = client.get_collection(name)
+            collection_counts[name] = 0
+            for part, batch in enumerate(_iter_collection(collection, batch_size)):
+                lines = []
+                for chunk_id, document, metadata, embedding in zip(batch["ids"], batch["documents"], batch["metadatas"], batch["embeddings"]):
+                    lines.append(json.dumps({"id": chunk_id, "document": document, "metadata": metadata,
+                                             "embedding": [float(value) for value in embedding]}))
+                    source = (metadata or {}).get("Source", "")
+                    sources[source] = sources.get(source, 0) + 1
+                _add_checked(archive, f"chunks/{name}/part-{part:05d}.jsonl", "\n".join(lines).encode('utf-8'))
+                collection_counts[name] += len(lines)
+                chunk_count += len(lines)
+                logger.info(f"Exported {chunk_count} chunks")
+
+        for path in _folder_files(summary_folder):
+            with open(path, 'rb') as file:
+                _add_checked(archive, f"image_summaries/{os.path.basename(path)}", file.read())
+
+        for path in _folder_files(image_folder):
+            with open(path, 'rb') as file:
+                _add_checked(archive, f"images/{os.path.basename(path)}", file.read())
+
+        for index_name, (get_index, _) in SIDE_INDEXES.items():
+            index = get_index()
+            if index is not None:
+                _export_index(archive, index_name, index)
+
+        manifest = {**header, "chunk_count": chunk_count, "collection_counts": collection_counts, "sources": sources}
+        _add_checked(archive, "ingestion_manifest.json", json.dumps(manifest, indent=2).encode('utf-8'))
+
+    logger.info(f"Snapshot written: {snapshot_path} ({chunk_count} chunks from {len(sources)} sources)")
+    return manifest
+
+
+def import_snapshot(snapshot_path: str, persist_directory: str, collection_name: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Bulk-loads a snapshot into fresh Chroma collections without re-embedding anything.
+
+    Members are verified against their checksums as they stream in; a mismatch aborts the import.
+    Chunks are loaded into staging collections that replace the targets only once the manifest's
+    chunk counts match, so a failed import leaves the targets untouched. A sharded snapshot is
+    restored into the same shard collections, and the sharding layout in config.json must match
+    the snapshot's. Side indexes are merged into the local ones, after the chunks are in place,
+    when those are enabled in config.json.
+
+    Args:
+        snapshot_path (str): The path of the snapshot file to read.
+        persist_directory (str): The Chroma persist directory to load into.
+        collection_name (Optional[str]): The collection (or shards' base name) to create; defaults to the snapshot's.
+        force (bool): If True, replace target collections that already contain chunks.
+
+    Returns:
+        Dict[str, Any]: The ingestion manifest read from the snapshot.
+
+    Raises:
+        ValueError: If the snapshot is unsupported, corrupt, sharded differently, or a target collection is not empty.
+    """
+    client = chromadb.PersistentClient(path=persist_directory)
+    summary_folder = config["settings"].get("image_summary_cache_directory_name", "image_summary_cache")
+    image_folder = config["settings"].get("image_directory_name")
+    text_store = get_text_store()
+    header = None
+    # Snapshot collection name -> (staging collection, target name)
+    collections = {}
+    collection_counts = {}
+    pending_indexes = []
+    manifest = None
+    pending_name, pending_data = None, None
+    chunk_count = 0
+
+    logger.info(f"Importing snapshot: {snapshot_path}")
+    with tempfile.TemporaryDirectory() as index_folder:
+        try:
+            with tarfile.open(snapshot_path, "r|gz") as archive:
+                for member in archive:
+                    data = archive.extractfile(member).read()
+
+                    if member.name == "header.json":
+                        header = json.loads(data)
+                        if header.get("format_version", 0) > SNAPSHOT_FORMAT_VERSION:
+                            raise ValueError(f"Unsupported snapshot format version: {header.get('format_version')}")
+                        if header.get("embedding_model_name") != config["VectorDB"].get("embedding_model_name"):
+                            raise ValueError(f"Snapshot was embedded with '{header.get('embedding_model_name')}', "
+                                             f"but config uses '{config['VectorDB'].get('embedding_model_name')}'.")
+                        if header.get("sharding") != _sharding_layout():
+                            raise ValueError(f"Snapshot sharding {header.get('sharding')} does not match config.json sharding {_sharding_layout()}.")
+                        # Shard collections keep their suffix under the target base name
+                        target_base = collection_name or header["collection_name"]
+                        existing = {getattr(collection, "name", collection) for collection in client.list_collections()}
+                        for name in header.get("collections", [header["collection_name"]]):
+                            target_name = target_base + name[len(header["collection_name"]):]
+                            if target_name in existing and client.get_collection(target_name).count() and not force:
+                                raise ValueError(f"Collection '{target_name}' is not empty; use --force to replace it.")
+                            staging_name = f"{target_name}__import"
+                            if staging_name in existing:
+                                client.delete_collection(staging_name)
+                            collections[name] = (client.create_collection(staging_name), target_name)
+                            collection_counts[name] = 0
+                        continue
+
+                    if not member.name.endswith(".sha256"):
+                        pending_name, pending_data = member.name, data
+                        continue
+
+                    if member.name != f"{pending_name}.sha256" or hashlib.sha256(pending_data).hexdigest() != data.decode('utf-8'):
+                        raise ValueError(f"Checksum mismatch for snapshot member: {pending_name}")
+                    if header is None:
+                        raise ValueError("Snapshot header is missing.")
+
+                    if pending_name.startswith("chunks/"):
+                        # Version 1 snapshots hold a single collection directly under chunks/
+                        parts = pending_name.split("/")
+                        name = parts[1] if len(parts) == 3 else header["collection_name"]
+                        collection = collections[name][0]
+                        records = [json.loads(line) for line in pending_data.decode('utf-8').splitlines() if line]
+                        collection.add(
+                            ids=[record["id"] for record in records],
+                            documents=[record["document"] for record in records],
+                            metadatas=[record["metadata"] for record in records],
+                            embeddings=[record["embedding"] for record in records],
+                        )
+                        if text_store is not None:
+                            text_store.put_many((record["id"], record["document"]) for record in records)
+                        collection_counts[name] += len(records)
+                        chunk_count += len(records)
+                        logger.info(f"Imported {chunk_count} chunks")
+                    elif pending_name.startswith(("image_summaries/", "images/")):
+                        folder = summary_folder if pending_name.startswith("image_summaries/") else image_folder
+                        os.makedirs(folder, exist_ok=True)
+                        with open(os.path.join(folder, os.path.basename(pending_name)), 'wb') as file:
+                            file.write(pending_data)
+                    elif pending_name.startswith("indexes/"):
+                        # Merged only once the chunks they refer to are in place
+                        index_name = os.path.splitext(os.path.basename(pending_name))[0]
+                        path = os.path.join(index_folder, f"{index_name}.sqlite")
+                        with open(path, 'wb') as file:
+                            file.write(pending_data)
+                        pending_indexes.append((index_name, path))
+                    elif pending_name == "ingestion_manifest.json":
+                        manifest = json.loads(pending_data)
+                    pending_name, pending_data = None, None
+
+                if manifest is None:
+                    raise ValueError("Snapshot is incomplete: ingestion manifest is missing.")
+                if manifest["chunk_count"] != chunk_count or manifest.get("collection_counts", collection_counts) != collection_counts:
+                    raise ValueError(f"Snapshot is incomplete: expected {manifest['chunk_count']} chunks, imported {chunk_count}.")
+        except Exception:
+            # Staging collections of a failed import are dropped; the targets were never touched
+            for staging, _ in collections.values():
+                try:
+                    client.delete_collection(staging.name)
+                except Exception:
+                    pass
+            raise
+
+        for staging, target_name in collections.values():
+            _replace_collection(client, staging.name, target_name)
+
+        for index_name, path in pending_indexes:
+            get_index, tables = SIDE_INDEXES[index_name]
+            index = get_index()
+            if index is None:
+                logger.warning(f"Snapshot contains the {index_name} index, but it is disabled in config.json; skipped.")
+            else:
+                with open(path, 'rb') as file:
+                    _import_index(index, file.read(), tables)
+                logger.info(f"Imported {index_name} index")
+
+    logger.info(f"Snapshot imported: {chunk_count} chunks from {len(manifest['sources'])} sources")
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or import a portable snapshot of the vector index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write the index to a snapshot file.")
+    export_parser.add_argument("snapshot_path")
+
+    import_parser = subparsers.add_parser("import", help="Load a snapshot file into a fresh index.")
+    import_parser.add_argument("snapshot_path")
+    import_parser.add_argument("--force", action="store_true", help="Replace the target collection even if it is not empty.")
+
+    args = parser.parse_args()
+    persist_directory = config["VectorDB"]["vector_db_persist_directory_name"]
+    collection_name = config["VectorDB"]["collection_name"]
+
+    if args.command == "export":
+        export_snapshot(persist_directory, collection_name, args.snapshot_path, snapshot_config.get("batch_size", 1000))
+    else:
+        import_snapshot(args.snapshot_path, persist_directory, collection_name, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import psutil
+from logging_config import logger
+from utilities import fitz_lock, config_section
+
+ingestion_config = config_section("ingestion")
+
+MB = 1024 * 1024
+
+# Rough peak-memory multipliers over the file size, per file type
+SIZE_MULTIPLIERS = {
+    '.pdf': 4,
+    '.docx': 10,
+    '.txt': 3,
+    '.csv': 8,
+    '.xls': 25,
+    '.xlsx': 25,
+}
+
+
+def estimate_job_memory(file_path: str) -> int:
+    """
+    Estimates the peak memory needed to ingest a file from its type, size and page count.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        int: The estimated peak memory in bytes.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    size = os.path.getsize(file_path)
+    estimate = ingestion_config.get("base_job_memory_mb", 50) * MB + size * SIZE_MULTIPLIERS.get(extension, 4)
+
+    if extension == '.pdf':
+        import fitz
+        try:
+            with fitz_lock, fitz.open(file_path) as document:
+                # Page rendering, OCR and extracted images scale with the page count
+                estimate += document.page_count * ingestion_config.get("memory_per_pdf_page_mb", 2) * MB
+        except Exception as e:
+            logger.warning(f"Could not read page count of '{file_path}' for memory estimate: {e}")
+
+    return estimate
+
+
+class MemoryBudgetScheduler:
+    """
+    Runs ingestion jobs on worker threads, admitting a job only when its estimated memory fits
+    under a global RSS budget.
+
+    Jobs share the process (and its vector store client), so PyMuPDF calls are serialized through
+    `fitz_lock`; rendering for OCR runs in separate worker processes.
+
+    Concurrency follows the budget: many small files run side by side, while a large PDF or
+    spreadsheet waits until enough memory is free. One job is always admitted when nothing else
+    is running, so a job larger than the whole budget still runs on its own.
+    """
+
+    def __init__(self, rss_budget_bytes: int, max_workers: Optional[int] = None, max_skips: int = 3):
+        self.rss_budget_bytes = rss_budget_bytes
+        self.max_workers = max_workers or os.cpu_count()
+        self.max_skips = max_skips
+        self.process = psutil.Process()
+        self.reserved = 0
+        self.running = 0
+        self.baseline_rss = self.process.memory_info().rss
+        self._condition = threading.Condition()
+
+    def _fits(self, estimate: int) -> bool:
+        if self.running == 0:
+            return True
+        if self.running >= self.max_workers:
+            return False
+        # Jobs that just started may not have grown yet, so trust their reservations until they do
+        current_rss = self.process.memory_info().rss
+        projected_rss = max(current_rss, self.baseline_rss + self.reserved)
+        return projected_rss + estimate <= self.rss_budget_bytes
+
+    def _run_job(self, name: str, estimate: int, job: Callable[[], None]) -> None:
+        try:
+            job()
+        except Exception as e:
+            logger.error(f"Error processing {name}: {e}")
+        finally:
+            with self._condition:
+                self.reserved -= estimate
+                self.running -= 1
+                self._condition.notify_all()
+
+    def run(self, jobs: List[Tuple[str, Callable[[], None]]]) -> None:
+        """
+        Runs all jobs, admitting them as memory allows, and waits for them to finish.
+
+        Jobs are taken in order, but a smaller job may overtake one that does not fit yet; a job
+        that has been overtaken `max_skips` times blocks further overtaking until it is admitted.
+
+        Args:
+            jobs (List[Tuple[str, Callable[[], None]]]): Pairs of file path and the callable that ingests it.
+        """
+        self.baseline_rss = self.process.memory_info().rss
+        pending = []
+        for file_path, job in jobs:
+            try:
+                pending.append([file_path, estimate_job_memory(file_path), job, 0])
+            except OSError as e:
+                logger.error(f"Skipping {os.path.basename(file_path)}: {e}")
+
+        threads = []
+        with self._condition:
+            while pending:
+                admitted = None
+                for index, entry in enumerate(pending):
+                    if self._fits(entry[1]):
+                        admitted = pending.pop(index)
+                        for skipped in pending[:index]:
+                            skipped[3] += 1
+                        break
+                    if entry[3] >= self.max_skips:
+                        break
+
+                if admitted is None:
+                    logger.info(f"Admission deferred: {self.running} job(s) running, "
+                                f"{self.reserved // MB} MB reserved of {self.rss_budget_bytes // MB} MB budget, "
+                                f"{len(pending)} job(s) waiting")
+                    self._condition.wait(timeout=5)
+                    continue
+
+                file_path, estimate, job, _ = admitted
+                self.reserved += estimate
+                self.running += 1
+                logger.info(f"Admitted {os.path.basename(file_path)} (estimated {estimate // MB} MB); "
+                            f"{self.running} job(s) running, {self.reserved // MB} MB reserved")
+                thread = threading.Thread(target=self._run_job, args=(os.path.basename(file_path), estimate, job), daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for thread in threads:
+            thread.join()
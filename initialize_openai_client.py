@@ -1,7 +1,5 @@
-import os
-import openai
+from llm_client import LLMClient, get_llm_client
 
-def initialize_openai_client():
-    # Initialize OpenAI client without 'proxies'
-    client = openai.Client(api_key=os.getenv("OPENAI_API_KEY"))
-    return client
+def initialize_openai_client() -> LLMClient:
+    # Shared, connection-pooled client configured from the 'llm_client' section of config.json
+    return get_llm_client()
@@ -0,0 +1,108 @@
+import threading
+from typing import Any, Dict, List
+
+from langchain.schema import Document
+from logging_config import logger
+from image_processing import encode_image_base64, cached_image_summary
+from model_router import single_flight
+from chunk_store import chunk_field
+from utilities import text_splitter
+from vector_database import image_db_insetter
+
+
+class LazyImageSummarizer:
+    """
+    Generates image summaries on demand for images that were indexed with a cheap surrogate.
+
+    In lazy ingestion mode each image is stored as a single chunk of nearby page text and caption,
+    marked with `SummaryStatus: "pending"`. The first time any chunk from that page is retrieved,
+    the pending images of the page are summarized, the surrogate is replaced by the summary chunks
+    in the index, and the summary is written to the image summary cache.
+    """
+
+    def __init__(self, vector_db: Any, openai_client: Any, model_name: str, text_chunker: Any):
+        self.vector_db = vector_db
+        self.openai_client = openai_client
+        self.model_name = model_name
+        self.text_chunker = text_chunker
+        # Keyed by surrogate chunk id, not image path: a re-ingested PDF reuses the image paths
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def _pending_images(self, source: str, page_no: int) -> Dict[str, Dict[str, Any]]:
+        """Returns the pending surrogate chunks of a page, grouped by image path."""
+        pending = self.vector_db.get(where={"$and": [
+            {"Source": {"$eq": source}},
+            {"PageNo": {"$eq": page_no}},
+            {"SummaryStatus": {"$eq": "pending"}},
+        ]})
+        images = {}
+        for chunk_id, metadata in zip(pending["ids"], pending["metadatas"]):
+            image = images.setdefault(metadata["ImagePath"], {"ids": [], "metadata": metadata})
+            image["ids"].append(chunk_id)
+        return images
+
+    def _summarize(self, image_path: str, ids: List[str], metadata: Dict[str, Any]) -> Document:
+        with self._lock:
+            # Another query may have replaced these surrogates since they were looked up
+            for chunk_id in ids:
+                if chunk_id in self._resolved:
+                    return self._resolved[chunk_id]
+
+        logger.info(f"Lazily summarizing image: {image_path}")
+        encoded_image = encode_image_base64(image_path)
+        # Runs inside the question's scheduler slot, so it must not wait behind ingestion
+        image_summary = cached_image_summary(encoded_image, self.model_name, self.openai_client, priority=None)
+        split_summaries = text_splitter(image_summary, self.text_chunker)
+
+        # Insert the summary before dropping the surrogates, so a failed insert keeps the image indexed
+        image_db_insetter(self.vector_db, split_summaries, image_path, metadata["Source"], metadata["PageNo"],
+                          extra_metadata={"SummaryStatus": "done"})
+        self.vector_db.delete(ids=ids)
+
+        resolved = Document(page_content=split_summaries[0], metadata={**metadata, "SummaryStatus": "done"})
+        with self._lock:
+            for chunk_id in ids:
+                self._resolved[chunk_id] = resolved
+        return resolved
+
+    def resolve(self, documents: List[Document]) -> List[Document]:
+        """
+        Summarizes the pending images on every page that appears in the retrieved documents.
+
+        Args:
+            documents (List[Document]): The documents (or ChunkRecords) returned by the retriever.
+
+        Returns:
+            List[Document]: The documents, with retrieved surrogates replaced by their summaries.
+        """
+        pages = {(chunk_field(doc, "Source"), chunk_field(doc, "PageNo")) for doc in documents}
+        resolved_images = {}
+        for source, page_no in pages:
+            if source is None or page_no is None:
+                continue
+            try:
+                pending_images = self._pending_images(source, page_no)
+            except Exception as e:
+                logger.error(f"Error looking up pending images for '{source}', Page No: {page_no}. Error: {e}")
+                continue
+
+            for image_path, image in pending_images.items():
+                try:
+                    # Concurrent queries hitting the same page share one summarization
+                    resolved_images[image_path] = single_flight.do(
+                        f"image-summary:{image_path}", lambda: self._summarize(image_path, image["ids"], image["metadata"]))
+                except Exception as e:
+                    logger.error(f"Error lazily summarizing image '{image_path}': {e}")
+
+        resolved_documents = []
+        for doc in documents:
+            if chunk_field(doc, "SummaryStatus") != "pending":
+                resolved_documents.append(doc)
+                continue
+            # Surrogates summarized by a concurrent query are no longer pending in the index
+            chunk_id = getattr(doc, "chunk_id", None) or getattr(doc, "id", None)
+            with self._lock:
+                resolved = resolved_images.get(chunk_field(doc, "ImagePath")) or self._resolved.get(chunk_id)
+            resolved_documents.append(resolved or doc)
+        return resolved_documents
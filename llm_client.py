@@ -0,0 +1,269 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import openai
+from logging_config import logger
+from utilities import config_section
+
+client_config = config_section("llm_client")
+
+# OpenAI-compatible endpoints for the supported providers
+PROVIDERS = {
+    "openai": {"base_url": None, "api_key_env": "OPENAI_API_KEY"},
+    "gemini": {"base_url": "https://generativelanguage.googleapis.com/v1beta/openai/", "api_key_env": "GEMINI_API_KEY"},
+}
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the endpoint's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after a run of consecutive failures and rejects calls until the reset timeout has passed,
+    then lets a single trial call through (half-open) to decide whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self, endpoint: str) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_in_flight:
+                raise CircuitOpenError(f"Circuit breaker for endpoint '{endpoint}' is open.")
+            self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self, endpoint: str) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Opening circuit breaker for endpoint '{endpoint}' after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """
+    Shared client for OpenAI-compatible chat APIs.
+
+    Wraps a sync and an async OpenAI client that share pooled keep-alive HTTP transports, and adds
+    per-endpoint concurrency caps, deadline-aware retries with jittered exponential backoff, and
+    a circuit breaker per endpoint. Point `base_url` at a local fake server to test under load.
+    """
+
+    def __init__(self, provider: str = "openai", base_url: Optional[str] = None, api_key: Optional[str] = None, settings: Optional[Dict[str, Any]] = None):
+        if provider not in PROVIDERS:
+            raise ValueError(f"Invalid provider '{provider}'. Valid values are: {list(PROVIDERS)}")
+
+        self.settings = settings if settings is not None else client_config
+        self.provider = provider
+        base_url = base_url or PROVIDERS[provider]["base_url"]
+        api_key = api_key or os.getenv(PROVIDERS[provider]["api_key_env"])
+
+        limits = httpx.Limits(
+            max_connections=self.settings.get("max_connections", 100),
+            max_keepalive_connections=self.settings.get("max_keepalive_connections", 20),
+            keepalive_expiry=self.settings.get("keepalive_expiry_seconds", 30),
+        )
+        timeout = httpx.Timeout(self.settings.get("request_timeout_seconds", 60), connect=self.settings.get("connect_timeout_seconds", 5))
+
+        # Retries are handled here, so the SDK's own retry loop is disabled
+        self.sync_client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                                         http_client=httpx.Client(limits=limits, timeout=timeout))
+        self.async_client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                                               http_client=httpx.AsyncClient(limits=limits, timeout=timeout))
+
+        self._endpoint_limits = self.settings.get("endpoint_concurrency", {})
+        self._semaphores = {}
+        self._async_semaphores = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _concurrency(self, endpoint: str) -> int:
+        return self._endpoint_limits.get(endpoint, self.settings.get("default_concurrency", 8))
+
+    def _semaphore(self, endpoint: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if endpoint not in self._semaphores:
+                self._semaphores[endpoint] = threading.BoundedSemaphore(self._concurrency(endpoint))
+            return self._semaphores[endpoint]
+
+    def _async_semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        with self._lock:
+            if endpoint not in self._async_semaphores:
+                self._async_semaphores[endpoint] = asyncio.Semaphore(self._concurrency(endpoint))
+            return self._async_semaphores[endpoint]
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(
+                    failure_threshold=self.settings.get("circuit_failure_threshold", 5),
+                    reset_seconds=self.settings.get("circuit_reset_seconds", 30),
+                )
+            return self._breakers[endpoint]
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        base = self.settings.get("backoff_base_seconds", 0.5)
+        cap = self.settings.get("backoff_max_seconds", 20)
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+    def _next_delay(self, attempt: int, error: Exception, deadline: float, endpoint: str) -> float:
+        """Returns how long to wait before retrying, or re-raises if no retry fits before the deadline."""
+        delay = self._backoff(attempt, error)
+        max_attempts = self.settings.get("max_attempts", 5)
+        if attempt + 1 >= max_attempts or time.monotonic() + delay >= deadline:
+            logger.error(f"Giving up on endpoint '{endpoint}' after {attempt + 1} attempt(s): {error}")
+            raise error
+        logger.warning(f"Retrying endpoint '{endpoint}' in {delay:.2f}s after error: {error}")
+        return delay
+
+    def _deadline(self, deadline_seconds: Optional[float]) -> float:
+        return time.monotonic() + (deadline_seconds or self.settings.get("deadline_seconds", 120))
+
+    def call(self, endpoint: str, fn: Callable[[float], Any], deadline_seconds: Optional[float] = None,
+             timings: Optional[Dict[str, float]] = None) -> Any:
+        """
+        Runs a synchronous API call under the endpoint's concurrency cap, retries and circuit breaker.
+
+        Args:
+            endpoint (str): The name of the endpoint, used for concurrency caps and circuit breaking.
+            fn (Callable[[float], Any]): The call to make; it receives the remaining time budget in seconds.
+            deadline_seconds (Optional[float]): The overall time budget for all attempts.
+            timings (Optional[Dict[str, float]]): If given, "attempt_seconds" is set to the duration of
+                the successful attempt, without semaphore waits and retry backoff.
+
+        Returns:
+            Any: The result of the call.
+
+        Raises:
+            CircuitOpenError: If the endpoint's circuit breaker is open.
+            Exception: The last error if the call did not succeed before the deadline.
+        """
+        deadline = self._deadline(deadline_seconds)
+        breaker = self._breaker(endpoint)
+        attempt = 0
+        while True:
+            breaker.before_call(endpoint)
+            try:
+                with self._semaphore(endpoint):
+                    started = time.monotonic()
+                    result = fn(max(deadline - time.monotonic(), 0.1))
+                    if timings is not None:
+                        timings["attempt_seconds"] = time.monotonic() - started
+                breaker.record_success()
+                return result
+            except RETRYABLE_ERRORS as e:
+                breaker.record_failure(endpoint)
+                time.sleep(self._next_delay(attempt, e, deadline, endpoint))
+                attempt += 1
+            except Exception:
+                # Non-retryable errors (e.g. bad requests) say nothing about endpoint health
+                breaker.record_success()
+                raise
+
+    async def acall(self, endpoint: str, fn: Callable[[float], Any], deadline_seconds: Optional[float] = None) -> Any:
+        """
+        Async counterpart of `call`; `fn` returns an awaitable.
+        """
+        deadline = self._deadline(deadline_seconds)
+        breaker = self._breaker(endpoint)
+        attempt = 0
+        while True:
+            breaker.before_call(endpoint)
+            try:
+                async with self._async_semaphore(endpoint):
+                    result = await fn(max(deadline - time.monotonic(), 0.1))
+                breaker.record_success()
+                return result
+            except RETRYABLE_ERRORS as e:
+                breaker.record_failure(endpoint)
+                await asyncio.sleep(self._next_delay(attempt, e, deadline, endpoint))
+                attempt += 1
+            except Exception:
+                breaker.record_success()
+                raise
+
+    def create_chat_completion(self, deadline_seconds: Optional[float] = None, timings: Optional[Dict[str, float]] = None, **kwargs) -> Any:
+        """
+        Creates a chat completion through the shared sync client.
+
+        Args:
+            deadline_seconds (Optional[float]): The overall time budget for all attempts.
+            timings (Optional[Dict[str, float]]): Receives the duration of the successful attempt, see `call`.
+            **kwargs: Arguments passed to `chat.completions.create`.
+
+        Returns:
+            Any: The chat completion response.
+        """
+        return self.call("chat", lambda remaining: self.sync_client.with_options(timeout=remaining).chat.completions.create(**kwargs),
+                         deadline_seconds, timings)
+
+    async def acreate_chat_completion(self, deadline_seconds: Optional[float] = None, **kwargs) -> Any:
+        """
+        Creates a chat completion through the shared async client.
+        """
+        return await self.acall("chat", lambda remaining: self.async_client.with_options(timeout=remaining).chat.completions.create(**kwargs), deadline_seconds)
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """
+    Returns the process-wide shared LLM client, creating it from config.json on first use.
+
+    The provider and base URL come from the `llm_client` config section; the `LLM_BASE_URL`
+    environment variable overrides the base URL, e.g. to point at a local fake server in tests.
+
+    Returns:
+        LLMClient: The shared client.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient(
+                provider=client_config.get("provider", "openai"),
+                base_url=os.getenv("LLM_BASE_URL") or client_config.get("base_url"),
+            )
+        return _shared_client
@@ -56,17 +56,17 @@
 
 # if __name__ == "__main__":
 #     main()
-import os
 import logging
 import json
+import argparse
 import chromadb  # ✅ Using ChromaDB
 from dotenv import load_dotenv
 from file_processer import process_all_files
+from file_watcher import watch_folder
 from logging_config import logger
 from utilities import config
 from text_splitter import TextSplitter  # ✅ Ensure this module exists
-
-import google.generativeai as genai
+from initialize_openai_client import initialize_openai_client
 
 # Load environment variables
 load_dotenv()
@@ -77,44 +77,49 @@ with open('config.json', 'r') as config_file:
 
 # ✅ Initialize ChromaDB Vector Storage
 chroma_client = chromadb.PersistentClient(path="vector_db")
-vector_db = chroma_client.get_or_create_collection("my_collection")
-
-# ✅ Define model name for Gemini API
-model_name = "gemini-pro"
+if config["VectorDB"].get("sharding", {}).get("enabled", False):
+    # Partition chunks across several collections and fan queries out to all of them
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from sharded_vector_store import create_sharded_vector_store
+    embeddings = HuggingFaceEmbeddings(model_name=config["VectorDB"]["embedding_model_name"])
+    vector_db = create_sharded_vector_store(chroma_client, embeddings)
+else:
+    vector_db = chroma_client.get_or_create_collection("my_collection")
+
+# ✅ Model used for image summaries during ingestion
+model_name = config["openai"]["openai_text_image_model"]
 
 # ✅ Initialize text chunker
-text_chunker = TextSplitter(chunk_size=512)  # Ensure this class exists
-
-def initialize_gemini_client():
-    """
-    Initialize the Google Gemini client.
-    """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
-    
-    genai.configure(api_key=api_key)
-    return genai
+# Chunk size and overlap come from config.json, where retriever_tuner.py can write a tuned size
+text_chunker = TextSplitter(chunk_size=config["text_splitter"]["chunk_size"], chunk_overlap=config["text_splitter"]["chunk_overlap"])
 
 def main():
     """
     Main function to run the application.
     """
+    parser = argparse.ArgumentParser(description="Ingest documents into the vector database.")
+    parser.add_argument("--watch", action="store_true",
+                        help="After the initial run, keep watching the input folder and ingest changes as they happen.")
+    args = parser.parse_args()
+
     input_folder = config['settings']['input_folder']
     output_folder = config['settings']['output_folder']
 
-    # Initialize Google Gemini Client
-    gemini_client = initialize_gemini_client()
+    # Initialize the shared LLM client (provider is set in config.json)
+    llm_client = initialize_openai_client()
 
     # Process input files
     try:
         logger.info(f"Processing files in input folder: {input_folder}")
-        process_all_files(input_folder, vector_db, gemini_client, model_name, text_chunker)  # ✅ FIXED
+        process_all_files(input_folder, vector_db, llm_client, model_name, text_chunker)  # ✅ FIXED
         logger.info("File processing completed successfully.")
     except FileNotFoundError as e:
         logger.error(f"File not found: {e}")
     except Exception as e:
         logger.error(f"Unexpected error during file processing: {e}")
 
+    if args.watch:
+        watch_folder(input_folder, vector_db, llm_client, model_name, text_chunker)
+
 if __name__ == "__main__":
     main()
@@ -1,32 +1,88 @@
-from vector_database import retrieve_documents, create_retriever
-from typing import Any, List, Tuple
+from vector_database import retrieve_documents, retrieve_chunk_records, create_retriever
+from typing import Any, List, Optional, Tuple
+from itertools import zip_longest
 from image_processing import encode_image_base64
 from langchain.schema import Document
 from utilities import config
+from model_router import select_model, get_model, request_key, single_flight, tracked_completion
+from chunk_store import chunk_field, chunk_token_count, get_text_store
+from chunk_adjacency import adjacency_config, expand_neighbors
+from near_duplicates import dedup_config, get_duplicate_index
+from work_scheduler import measured_span_end, work_slot
 
+# Share of a text chunk's words found in a same-page table above which the chunk counts as a repeat of it
+TABLE_OVERLAP_THRESHOLD = 0.6
 
-def context_extractor(similar_docs: List[Document], MAX_IMAGES: int) -> Tuple[str, List[str], str, dict]:
+SYSTEM_PROMPT = "You are an advanced AI assistant designed to provide accurate, concise, and contextually relevant answers to user questions. Your responses should be clear, informative, and formatted in Markdown. Guidelines: Context Utilization: Use the provided context to answer the question at the end. Ensure your response is relevant and integrates the context effectively. Highlight key points from the context to support your answer. Response Clarity: Structure your answers to enhance readability. Use headings, bullet points, and lists where appropriate. Ensure that your language is straightforward and avoids jargon unless necessary. Honesty in Responses: If you do not know the answer to a question, clearly state that you do not know, without attempting to fabricate a response. Avoid guesswork and provide only verified information. Integration of Visuals: When images or additional context are provided, incorporate this information into your answers to enhance understanding. Reference visuals when necessary to clarify your points. User Engagement: Aim to engage users with a friendly and professional tone. Encourage follow-up questions or clarifications to ensure user satisfaction. Formatting Standards: Use appropriate Markdown formatting for headings, lists, and emphasis (bold/italics) to improve the presentation of your answers"
+
+
+def context_extractor(similar_docs: List[Document], MAX_IMAGES: int, prefer_tables: bool = False, token_budget: Optional[int] = None,
+                      neighbors: Optional[List[Tuple[List[Document], List[Document]]]] = None, question: str = "") -> Tuple[str, List[str], str, dict]:
     """
     Extracts context and image paths from a list of documents.
 
     Args:
-        similar_docs (List[Document]): A list of Document objects containing metadata and content.
+        similar_docs (List[Document]): A list of Document objects (or compact ChunkRecords) containing metadata and content.
         MAX_IMAGES (int): The maximum number of images to encode.
+        prefer_tables (bool): If True, table chunks are placed first in the context, and text chunks
+            that mostly repeat a retrieved table from the same page (e.g. the table's own text layer)
+            are skipped.
+        token_budget (Optional[int]): The maximum number of context tokens. Chunks that do not fit
+            are skipped, and the text of a ChunkRecord is only loaded if the chunk fits.
+        neighbors (Optional[List[Tuple[List[Document], List[Document]]]]): For each document, the chunks
+            before and after it (nearest first), from `expand_neighbors`. A text hit is extended with
+            its neighbors, nearest first, for as long as they fit the token budget.
+        question (str): The user question, counted with the context when the model is routed.
 
     Returns:
         Tuple[str, List[str], str, dict]: A tuple containing:
             - context (str): Concatenated text content from all documents.
             - list_encoded_images (List[str]): List of Base64 encoded images.
-            - model (str): The model name based on the presence of images.
+            - model (str): The model picked by the router for the extracted context and images.
             - references (dict): A dictionary mapping text and images to their sources.
     """
 
     list_image_paths = set()  # Use a set for O(1) lookups
     list_encoded_images = []
     context = ""
-    
-    # Retrieve the OpenAI model, defaulting to "gpt-3.5-turbo" if not set
-    model_name = config["openai"].get("openai_only_text_model", "gpt-3.5-turbo") or "gpt-3.5-turbo"
+    table_context = ""
+    table_words = {}
+    if prefer_tables:
+        for doc in similar_docs:
+            if chunk_field(doc, "Type") == "Table":
+                page_words = table_words.setdefault((chunk_field(doc, "Source"), chunk_field(doc, "PageNo")), set())
+                page_words.update(doc.page_content.lower().split())
+
+    def repeats_table(doc) -> bool:
+        page_words = table_words.get((chunk_field(doc, "Source"), chunk_field(doc, "PageNo")))
+        if not page_words:
+            return False
+        words = doc.page_content.lower().split()
+        return bool(words) and sum(word in page_words for word in words) / len(words) >= TABLE_OVERLAP_THRESHOLD
+    remaining_tokens = token_budget
+
+    def fits_budget(doc) -> bool:
+        nonlocal remaining_tokens
+        if remaining_tokens is None:
+            return True
+        tokens = chunk_token_count(doc)
+        if tokens > remaining_tokens:
+            return False
+        remaining_tokens -= tokens
+        return True
+
+    included_chunks = set()
+
+    def already_included(doc) -> bool:
+        # Chunks are identified by their position; chunks indexed without one are never merged
+        offset = chunk_field(doc, "ChunkOffset")
+        if offset is None:
+            return False
+        key = (chunk_field(doc, "Source"), chunk_field(doc, "PageNo"), offset)
+        if key in included_chunks:
+            return True
+        included_chunks.add(key)
+        return False
     
     references = {
         "text": [],  # To store the first text reference
@@ -36,14 +92,14 @@ def context_extractor(similar_docs: List[Document], MAX_IMAGES: int) -> Tuple[st
     first_text_reference_found = False
     first_image_reference_found = False
 
-    for doc in similar_docs:
+    for index, doc in enumerate(similar_docs):
         try:
-            doc_type = doc.metadata.get("Type")
-            pdf_name = doc.metadata.get("Source")  # Assuming Source is a key in metadata
-            page_no = doc.metadata.get("PageNo")    # Assuming PageNo is a key in metadata
+            doc_type = chunk_field(doc, "Type")
+            pdf_name = chunk_field(doc, "Source")  # Assuming Source is a key in metadata
+            page_no = chunk_field(doc, "PageNo")    # Assuming PageNo is a key in metadata
 
             if doc_type == "Image" and len(list_encoded_images) < MAX_IMAGES:
-                image_path = doc.metadata.get("ImagePath")
+                image_path = chunk_field(doc, "ImagePath")
                 if image_path not in list_image_paths:
                     encoded_image = encode_image_base64(image_path)
                     list_encoded_images.append(encoded_image)
@@ -53,22 +109,60 @@ def context_extractor(similar_docs: List[Document], MAX_IMAGES: int) -> Tuple[st
                         references["image"].append({"pdf_name": pdf_name, "page_no": page_no})
                         first_image_reference_found = True
 
-                    # Retrieve the OpenAI model, defaulting to "gpt-4o" if not set
-                    model_name = config["openai"].get("openai_text_image_model", "gpt-4o") or "gpt-4o"
+            elif doc_type == "Table":
+                if not fits_budget(doc):
+                    continue
+                table_context += doc.page_content + "\n\n"
+                if not first_text_reference_found:
+                    references["text"].append({"pdf_name": pdf_name, "page_no": page_no})
+                    first_text_reference_found = True
 
             elif doc_type == "Text":
-                context += doc.page_content + "\n"
+                if repeats_table(doc) or already_included(doc) or not fits_budget(doc):
+                    continue
+
+                # Grow the hit outwards in reading order; a side stops at the first neighbor that
+                # does not fit or is already in the context, so the text stays contiguous
+                parts = [doc.page_content]
+                before, after = neighbors[index] if neighbors else ([], [])
+                growing = [True, True]
+                for pair in zip_longest(before, after):
+                    for side, neighbor in enumerate(pair):
+                        if neighbor is None or not growing[side]:
+                            continue
+                        if already_included(neighbor) or not fits_budget(neighbor):
+                            growing[side] = False
+                            continue
+                        if side == 0:
+                            parts.insert(0, neighbor.page_content)
+                        else:
+                            parts.append(neighbor.page_content)
+                context += "\n".join(parts) + "\n"
                 if not first_text_reference_found:
-                    references["text"].append({"pdf_name": pdf_name, "page_no": page_no})
+                    # Deduplicated chunks cite the first few sources and pages their text appears in
+                    duplicate_index = get_duplicate_index()
+                    chunk_id = getattr(doc, "chunk_id", None) or chunk_field(doc, "ChunkId")
+                    occurrences, total = [], 0
+                    if duplicate_index is not None and chunk_id is not None:
+                        occurrences, total = duplicate_index.occurrences_of(chunk_id, dedup_config.get("max_references", 10))
+                    references["text"].extend(occurrences or [{"pdf_name": pdf_name, "page_no": page_no}])
+                    references["text_more"] = total - len(occurrences)
                     first_text_reference_found = True
 
         except Exception as e:
             # Log the error or handle it as needed
             print(f"Error processing document: {e}")  # Replace with proper logging
 
-    # Strip the context and ensure references are single entries
-    return context.strip(), list_encoded_images, model_name, {
-        "text": references["text"][:1],  # Only the first text reference
+    # Tables go first when preferred, since they answer numeric questions in fewer tokens
+    context = table_context + context if prefer_tables else context + table_context
+
+    context = context.strip()
+    model_name = select_model(context, len(list_encoded_images), question)
+
+    # Ensure references are single entries
+    return context, list_encoded_images, model_name, {
+        "text": references["text"],  # Only the first text reference, with its first occurrences
+        "text_more": references.get("text_more", 0),  # Occurrences of it that were left out
         "image": references["image"][:1]  # Only the first image reference, if available
     }
 
@@ -78,19 +172,24 @@ def structure_references(references: dict) -> str:
     Structures the references from the given dictionary into a formatted string.
 
     Args:
-        references (dict): A dictionary containing 'text' and 'image' references.
+        references (dict): A dictionary containing 'text' and 'image' references, and optionally
+            'text_more', the number of further text occurrences that were not listed.
 
     Returns:
         str: A formatted string of references.
     """
     formatted_references = []
+    max_references = dedup_config.get("max_references", 10)
 
     if references.get("text"):
         formatted_references.append("Text:")
-        for ref in references["text"]:
+        for ref in references["text"][:max_references]:
             pdf_name = ref.get("pdf_name", "Unknown Source").strip()
             page_no = ref.get("page_no", "Unknown Page")
             formatted_references.append(f"   PDF Name: {pdf_name}  Page No: {page_no}")
+        more = len(references["text"][max_references:]) + references.get("text_more", 0)
+        if more:
+            formatted_references.append(f"   ... and {more} more")
 
     if references.get("image"):
         if formatted_references:
@@ -123,41 +222,36 @@ def model_response(context: str, image_encodings: list, model_name: str, openai_
     if len(context) == 0 and len(image_encodings) == 0:
         return "Your question found no relevant answers from the document"
 
-    if model_name == config["openai"]["openai_text_image_model"]:
+    model = get_model(model_name)
+    if model is None:
+        raise ValueError(f"Invalid model name: {model_name}")
+
+    image_context = []
+    if model.get("supports_images", False):
         image_context = [
             {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_encoding}"}}
             for image_encoding in image_encodings
         ]
 
-        response_from_model = openai_client.chat.completions.create(
+    def create_completion(timings):
+        return openai_client.create_chat_completion(
+            timings=timings,
             model=model_name,
             messages=[
-                {"role": "system", "content":"You are an advanced AI assistant designed to provide accurate, concise, and contextually relevant answers to user questions. Your responses should be clear, informative, and formatted in Markdown. Guidelines: Context Utilization: Use the provided context to answer the question at the end. Ensure your response is relevant and integrates the context effectively. Highlight key points from the context to support your answer. Response Clarity: Structure your answers to enhance readability. Use headings, bullet points, and lists where appropriate. Ensure that your language is straightforward and avoids jargon unless necessary. Honesty in Responses: If you do not know the answer to a question, clearly state that you do not know, without attempting to fabricate a response. Avoid guesswork and provide only verified information. Integration of Visuals: When images or additional context are provided, incorporate this information into your answers to enhance understanding. Reference visuals when necessary to clarify your points. User Engagement: Aim to engage users with a friendly and professional tone. Encourage follow-up questions or clarifications to ensure user satisfaction. Formatting Standards: Use appropriate Markdown formatting for headings, lists, and emphasis (bold/italics) to improve the presentation of your answers"
-},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": [{"type": "text", "text": text_context}] + image_context}
             ],
             temperature=config["openai"]["temperature"],
         )
 
-        return response_from_model.choices[0].message.content
+    # Identical in-flight requests share a single upstream call
+    key = request_key(model_name, question, context, image_encodings)
+    response_from_model = single_flight.do(key, lambda: tracked_completion(model_name, create_completion))
 
-    elif model_name == config["openai"]["openai_only_text_model"]:
-        response_from_model = openai_client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": "You are an advanced AI assistant designed to provide accurate, concise, and contextually relevant answers to user questions. Your responses should be clear, informative, and formatted in Markdown. Guidelines: Context Utilization: Use the provided context to answer the question at the end. Ensure your response is relevant and integrates the context effectively. Highlight key points from the context to support your answer. Response Clarity: Structure your answers to enhance readability. Use headings, bullet points, and lists where appropriate. Ensure that your language is straightforward and avoids jargon unless necessary. Honesty in Responses: If you do not know the answer to a question, clearly state that you do not know, without attempting to fabricate a response. Avoid guesswork and provide only verified information. Integration of Visuals: When images or additional context are provided, incorporate this information into your answers to enhance understanding. Reference visuals when necessary to clarify your points. User Engagement: Aim to engage users with a friendly and professional tone. Encourage follow-up questions or clarifications to ensure user satisfaction. Formatting Standards: Use appropriate Markdown formatting for headings, lists, and emphasis (bold/italics) to improve the presentation of your answers"},
-                {"role": "user", "content": [{"type": "text", "text": text_context}]}
-            ],
-            temperature=config["openai"]["temperature"],
-        )
+    return response_from_model.choices[0].message.content
 
-        return response_from_model.choices[0].message.content
 
-    else:
-        raise ValueError(f"Invalid model name: {model_name}")
-
-
-def generate_answer_from_vector_db(retriever, user_question: str, max_images: int, openai_client) -> Tuple[str, str]:
+def generate_answer_from_vector_db(retriever, user_question: str, max_images: int, openai_client, image_resolver: Any = None, priority: str = "interactive") -> Tuple[str, str]:
     """
     Generates an answer to a user question using the provided document retriever and OpenAI client.
 
@@ -166,27 +260,46 @@ def generate_answer_from_vector_db(retriever, user_question: str, max_images: in
         user_question (str): The question posed by the user.
         max_images (int): The maximum number of images to include in the response.
         openai_client: The OpenAI client instance.
+        image_resolver (Any): Optional LazyImageSummarizer that summarizes lazily indexed images on retrieval.
+        priority (str): The work scheduler class to run under: "interactive" for live users, "batch" for bulk QA runs.
 
     Returns:
         Tuple[str, str]: A tuple containing the structured references and the generated response.
     """
-    # Retrieve documents relevant to the user's question
-    similar_documents = retrieve_documents(retriever, user_question)
-
-    # Extract context, image encodings, model name, and references from the documents
-    context, image_encodings, model_name, references = context_extractor(similar_documents, max_images)
-
-    # Generate a response using the extracted context and images
-    generated_response = model_response(
-        context=context,
-        image_encodings=image_encodings,
-        question=user_question,
-        model_name=model_name,
-        openai_client=openai_client
-    )
-
-    # Structure the references into a formatted string
-    formatted_references = structure_references(references)
+    with work_slot(priority) as ticket:
+        retriever_config = config["VectorDB"]["retriever"]
+
+        # Retrieve documents relevant to the user's question
+        if get_text_store() is not None and retriever_config["search_algorithm"] == "similarity" and hasattr(retriever, "vectorstore"):
+            # Compact records first; chunk text is loaded only for chunks that fit the token budget
+            similar_documents = retrieve_chunk_records(retriever.vectorstore, user_question, retriever_config["top_k"])
+            if image_resolver is not None:
+                similar_documents = image_resolver.resolve(similar_documents)
+        else:
+            similar_documents = retrieve_documents(retriever, user_question, image_resolver)
+
+        # Extract context, image encodings, model name, and references from the documents
+        prefer_tables = retriever_config.get("prefer_tables", False)
+        token_budget = retriever_config.get("context_token_budget")
+        neighbors = None
+        vector_store = getattr(retriever, "vectorstore", None) or getattr(retriever, "store", None)
+        if adjacency_config.get("enabled", False) and vector_store is not None:
+            neighbors = expand_neighbors(vector_store, similar_documents, adjacency_config.get("neighbor_chunks", 1))
+        context, image_encodings, model_name, references = context_extractor(similar_documents, max_images, prefer_tables, token_budget, neighbors, user_question)
+        # The scheduler's query latency covers queueing and retrieval unless latency_span is "total"
+        measured_span_end(ticket)
+
+        # Generate a response using the extracted context and images
+        generated_response = model_response(
+            context=context,
+            image_encodings=image_encodings,
+            question=user_question,
+            model_name=model_name,
+            openai_client=openai_client
+        )
+
+        # Structure the references into a formatted string
+        formatted_references = structure_references(references)
 
     # Return the formatted references and the generated response as a tuple
     return formatted_references, generated_response
@@ -0,0 +1,229 @@
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import tiktoken
+from logging_config import logger
+from utilities import config_section
+
+routing_config = config_section("routing")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens in a piece of text using the cl100k_base encoding.
+
+    The encoding is loaded on first use (tiktoken may download it), so importing this module
+    stays cheap for code paths that never count tokens.
+
+    Args:
+        text (str): The text to count.
+
+    Returns:
+        int: The number of tokens.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text))
+
+
+class ModelStats:
+    """
+    Thread-safe running statistics per model: an exponentially weighted latency and total cost.
+
+    Latency starts from a prior and, between samples, decays back towards it with the given
+    half-life. A model that was slow once is therefore tried (and re-measured) again later
+    instead of being avoided for the life of the process.
+    """
+
+    def __init__(self, smoothing: float = 0.2, prior_latency_seconds: float = 2.0, decay_half_life_seconds: float = 300.0):
+        self.smoothing = smoothing
+        self.prior_latency_seconds = prior_latency_seconds
+        self.decay_half_life_seconds = decay_half_life_seconds
+        self.latency = {}
+        self.sampled_at = {}
+        self.cost = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _decayed_latency(self, model_name: str, now: float) -> float:
+        # Must be called with the lock held
+        if model_name not in self.latency:
+            return self.prior_latency_seconds
+        if not self.decay_half_life_seconds:
+            return self.latency[model_name]
+        weight = 0.5 ** ((now - self.sampled_at[model_name]) / self.decay_half_life_seconds)
+        return self.prior_latency_seconds + (self.latency[model_name] - self.prior_latency_seconds) * weight
+
+    def record(self, model_name: str, latency_seconds: float, cost: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            previous = self._decayed_latency(model_name, now)
+            self.latency[model_name] = self.smoothing * latency_seconds + (1 - self.smoothing) * previous
+            self.sampled_at[model_name] = now
+            self.cost[model_name] = self.cost.get(model_name, 0.0) + cost
+            self.calls[model_name] = self.calls.get(model_name, 0) + 1
+
+    def average_latency(self, model_name: str) -> float:
+        with self._lock:
+            return self._decayed_latency(model_name, time.monotonic())
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {"latency": self.latency[name], "cost": self.cost[name], "calls": self.calls[name]}
+                for name in self.calls
+            }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key so that only one of them runs; the others wait for
+    and share its result (or its exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            logger.info(f"Coalescing request with in-flight call: {key[:12]}")
+            call["done"].wait()
+        else:
+            try:
+                call["result"] = fn()
+            except Exception as e:
+                call["error"] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call["done"].set()
+
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+
+model_stats = ModelStats(
+    smoothing=routing_config.get("latency_smoothing", 0.2),
+    prior_latency_seconds=routing_config.get("prior_latency_seconds", 2.0),
+    decay_half_life_seconds=routing_config.get("latency_decay_half_life_seconds", 300),
+)
+single_flight = SingleFlight()
+
+
+def routing_models() -> List[Dict[str, Any]]:
+    """
+    Returns the models available for routing, as configured under routing.models in config.json.
+
+    Returns:
+        List[Dict[str, Any]]: Model descriptions with name, supports_images, max_context_tokens and per-1k-token costs.
+    """
+    return routing_config.get("models", [])
+
+
+def get_model(model_name: str) -> Optional[Dict[str, Any]]:
+    return next((model for model in routing_models() if model["name"] == model_name), None)
+
+
+def estimate_cost(model: Dict[str, Any], input_tokens: int, output_tokens: int) -> float:
+    return (input_tokens * model.get("cost_per_1k_input_tokens", 0.0)
+            + output_tokens * model.get("cost_per_1k_output_tokens", 0.0)) / 1000
+
+
+def select_model(context: str, image_count: int, question: str = "") -> str:
+    """
+    Picks the cheapest configured model that can handle the request.
+
+    A model is eligible if it supports images (when any are attached) and its context window fits
+    the prompt. Eligible models are ranked by estimated cost plus a latency penalty based on the
+    observed average latency, so routing shifts away from models that are slowing down.
+
+    Args:
+        context (str): The reference context that will be sent to the model.
+        image_count (int): The number of images that will be attached.
+        question (str): The user question.
+
+    Returns:
+        str: The name of the selected model.
+
+    Raises:
+        ValueError: If no models are configured for routing.
+    """
+    models = routing_models()
+    if not models:
+        raise ValueError("No models are configured under 'routing.models' in config.json.")
+
+    prompt_tokens = count_tokens(context) + count_tokens(question) + image_count * routing_config.get("tokens_per_image", 765)
+    expected_output_tokens = routing_config.get("expected_output_tokens", 500)
+    latency_weight = routing_config.get("latency_cost_per_second", 0.001)
+
+    eligible = [
+        model for model in models
+        if (image_count == 0 or model.get("supports_images", False))
+        and prompt_tokens + expected_output_tokens <= model.get("max_context_tokens", float("inf"))
+    ]
+    if not eligible:
+        eligible = [model for model in models if image_count == 0 or model.get("supports_images", False)] or models
+        eligible = [max(eligible, key=lambda model: model.get("max_context_tokens", 0))]
+
+    selected = min(
+        eligible,
+        key=lambda model: estimate_cost(model, prompt_tokens, expected_output_tokens)
+        + latency_weight * model_stats.average_latency(model["name"])
+    )
+    logger.info(f"Routed request with {prompt_tokens} prompt tokens and {image_count} image(s) to model: {selected['name']}")
+    return selected["name"]
+
+
+def request_key(model_name: str, question: str, context: str, image_encodings: List[str]) -> str:
+    digest = hashlib.sha256()
+    for part in [model_name, question, context, *image_encodings]:
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def tracked_completion(model_name: str, create: Callable[[Dict[str, float]], Any]) -> Any:
+    """
+    Runs a chat completion call and records its latency and cost for the model.
+
+    Only the successful attempt is timed, so concurrency waits and retry backoff (e.g. after a
+    burst of rate limit errors) do not count against the model.
+
+    Args:
+        model_name (str): The model the call is made against.
+        create (Callable[[Dict[str, float]], Any]): Performs the completion request; it receives a
+            timings dict to pass to `LLMClient.create_chat_completion`.
+
+    Returns:
+        Any: The completion response.
+    """
+    timings = {}
+    start = time.perf_counter()
+    response = create(timings)
+    latency = timings.get("attempt_seconds", time.perf_counter() - start)
+
+    usage = getattr(response, "usage", None)
+    model = get_model(model_name) or {}
+    cost = estimate_cost(model, getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)) if usage else 0.0
+    model_stats.record(model_name, latency, cost)
+    logger.info(f"Model {model_name} answered in {latency:.2f}s at an estimated cost of ${cost:.5f}")
+    return response
@@ -0,0 +1,219 @@
+import hashlib
+import random
+import sqlite3
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from logging_config import logger
+from utilities import config_section, shared_if_enabled
+
+dedup_config = config_section("deduplication")
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def _shingles(text: str, shingle_size: int) -> set:
+    words = text.lower().split()
+    if len(words) <= shingle_size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of chunk signatures, persisted in SQLite.
+
+    Each chunk is reduced to a MinHash signature over its word shingles. The signature is split
+    into bands; chunks sharing any band bucket are candidates, and a candidate counts as a
+    near-duplicate when the estimated Jaccard similarity reaches the threshold.
+    """
+
+    def __init__(self, index_path: str, num_perm: int = 128, bands: int = 16, threshold: float = 0.8, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("The number of permutations must be divisible by the number of bands.")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        # Fixed seed so signatures stay comparable across runs
+        generator = random.Random(1)
+        self.permutations = [
+            (generator.randint(1, MERSENNE_PRIME - 1), generator.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(index_path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS signatures (chunk_id TEXT PRIMARY KEY, signature BLOB)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS buckets (band INTEGER, bucket TEXT, chunk_id TEXT)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket)")
+        # Indexes created before bucket rows were unique may hold repeats (e.g. from a forced snapshot import)
+        if not self.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'buckets_unique'").fetchone():
+            self.connection.execute("DELETE FROM buckets WHERE rowid NOT IN (SELECT MIN(rowid) FROM buckets GROUP BY band, bucket, chunk_id)")
+            self.connection.execute("CREATE UNIQUE INDEX buckets_unique ON buckets (band, bucket, chunk_id)")
+        # Every (source, page) a stored chunk occurs in, so deleting a source can find all chunks that cite it
+        self.connection.execute("CREATE TABLE IF NOT EXISTS occurrences (chunk_id TEXT, source TEXT, page_no INTEGER, UNIQUE (chunk_id, source, page_no))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS occurrences_by_source ON occurrences (source)")
+        self.connection.commit()
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """
+        Computes the MinHash signature of a text.
+
+        Args:
+            text (str): The chunk text.
+
+        Returns:
+            Tuple[int, ...]: The signature, one minimum per permutation.
+        """
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), "little")
+            for shingle in _shingles(text, self.shingle_size)
+        ]
+        if not hashes:
+            return tuple([MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * value + b) % MERSENNE_PRIME) & MAX_HASH for value in hashes)
+            for a, b in self.permutations
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, str]]:
+        return [
+            (band, hashlib.md5(struct.pack(f"<{self.rows}I", *signature[band * self.rows:(band + 1) * self.rows])).hexdigest())
+            for band in range(self.bands)
+        ]
+
+    def _similarity(self, first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        return sum(1 for a, b in zip(first, second) if a == b) / self.num_perm
+
+    def find_duplicate(self, signature: Tuple[int, ...], pending: Optional[Dict[str, Tuple[int, ...]]] = None) -> Optional[str]:
+        """
+        Looks up a near-duplicate of a signature in the index and among pending (not yet added) signatures.
+
+        Args:
+            signature (Tuple[int, ...]): The signature to look up.
+            pending (Optional[Dict[str, Tuple[int, ...]]]): Signatures of chunks in the current batch, by chunk id.
+
+        Returns:
+            Optional[str]: The chunk id of the best matching near-duplicate, or None.
+        """
+        candidates = dict(pending or {})
+        with self._lock:
+            for band, bucket in self._band_keys(signature):
+                rows = self.connection.execute(
+                    "SELECT s.chunk_id, s.signature FROM buckets b JOIN signatures s ON s.chunk_id = b.chunk_id "
+                    "WHERE b.band = ? AND b.bucket = ?", (band, bucket)
+                ).fetchall()
+                for chunk_id, blob in rows:
+                    candidates.setdefault(chunk_id, struct.unpack(f"<{self.num_perm}I", blob))
+
+        best_id, best_similarity = None, self.threshold
+        for chunk_id, candidate in candidates.items():
+            similarity = self._similarity(signature, candidate)
+            if similarity >= best_similarity:
+                best_id, best_similarity = chunk_id, similarity
+        return best_id
+
+    def add(self, signatures: Dict[str, Tuple[int, ...]]) -> None:
+        """
+        Adds chunk signatures to the persisted index.
+
+        Args:
+            signatures (Dict[str, Tuple[int, ...]]): Signatures by chunk id.
+        """
+        with self._lock:
+            for chunk_id, signature in signatures.items():
+                self.connection.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?)",
+                                        (chunk_id, struct.pack(f"<{self.num_perm}I", *signature)))
+                self.connection.executemany("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                                            [(band, bucket, chunk_id) for band, bucket in self._band_keys(signature)])
+            self.connection.commit()
+
+    def add_occurrences(self, occurrences: List[Tuple[str, str, int]]) -> None:
+        """
+        Records where chunks occur.
+
+        Args:
+            occurrences (List[Tuple[str, str, int]]): (chunk_id, source, page_no) rows, in reading order.
+        """
+        with self._lock:
+            self.connection.executemany("INSERT OR IGNORE INTO occurrences VALUES (?, ?, ?)", occurrences)
+            self.connection.commit()
+
+    def occurrences_of(self, chunk_id: str, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Returns where a chunk occurs, oldest first, up to a limit.
+
+        Args:
+            chunk_id (str): The chunk id.
+            limit (int): The maximum number of occurrences to return.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int]: The first occurrences ({"pdf_name", "page_no"}) and the total count.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT source, page_no FROM occurrences WHERE chunk_id = ? ORDER BY rowid LIMIT ?", (chunk_id, limit)
+            ).fetchall()
+            total = self.connection.execute("SELECT COUNT(*) FROM occurrences WHERE chunk_id = ?", (chunk_id,)).fetchone()[0]
+        return [{"pdf_name": source, "page_no": page_no} for source, page_no in rows], total
+
+    def remove_source(self, source: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Removes every occurrence in a source and returns what is left for the chunks that cited it.
+
+        Args:
+            source (str): The source file name.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: The remaining occurrences ({"pdf_name", "page_no"}, oldest
+                first) of every chunk that occurred in the source; empty for chunks that occur nowhere else.
+        """
+        with self._lock:
+            chunk_ids = [row[0] for row in self.connection.execute(
+                "SELECT DISTINCT chunk_id FROM occurrences WHERE source = ?", (source,)
+            ).fetchall()]
+            self.connection.execute("DELETE FROM occurrences WHERE source = ?", (source,))
+            self.connection.commit()
+
+            remaining = {chunk_id: [] for chunk_id in chunk_ids}
+            for chunk_id in chunk_ids:
+                rows = self.connection.execute(
+                    "SELECT source, page_no FROM occurrences WHERE chunk_id = ? ORDER BY rowid", (chunk_id,)
+                ).fetchall()
+                remaining[chunk_id] = [{"pdf_name": other_source, "page_no": page_no} for other_source, page_no in rows]
+        return remaining
+
+    def remove(self, chunk_ids: List[str]) -> None:
+        """
+        Removes chunks from the index, e.g. when their source document is deleted.
+
+        Args:
+            chunk_ids (List[str]): The ids of the chunks to remove.
+        """
+        with self._lock:
+            self.connection.executemany("DELETE FROM signatures WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self.connection.executemany("DELETE FROM buckets WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self.connection.executemany("DELETE FROM occurrences WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self.connection.commit()
+
+
+def _open_duplicate_index() -> NearDuplicateIndex:
+    index_path = dedup_config.get("index_path", "minhash_index.sqlite")
+    logger.info(f"Opening near-duplicate index: {index_path}")
+    return NearDuplicateIndex(
+        index_path=index_path,
+        num_perm=dedup_config.get("num_perm", 128),
+        bands=dedup_config.get("bands", 16),
+        threshold=dedup_config.get("threshold", 0.8),
+        shingle_size=dedup_config.get("shingle_size", 5),
+    )
+
+
+# The shared near-duplicate index, or None if deduplication is disabled in config.json
+get_duplicate_index = shared_if_enabled(dedup_config, _open_duplicate_index)
@@ -0,0 +1,180 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+import fitz
+from logging_config import logger
+from utilities import config_section
+
+ocr_config = config_section("ocr")
+
+
+def has_usable_text_layer(extracted_text: str, min_chars: int) -> bool:
+    """
+    Checks whether text extracted from a PDF page is usable or the page should be sent to OCR.
+
+    Args:
+        extracted_text (str): The text returned by the PDF text layer, possibly empty.
+        min_chars (int): The minimum number of non-whitespace characters for the text layer to count as usable.
+
+    Returns:
+        bool: True if the page has a usable text layer, False otherwise.
+    """
+    if not extracted_text:
+        return False
+    return sum(1 for char in extracted_text if not char.isspace()) >= min_chars
+
+
+def _read_cached_text(cache_path: str) -> str:
+    with open(cache_path, 'r', encoding='utf-8') as cache_file:
+        return cache_file.read()
+
+
+def _write_cached_text(cache_path: str, text: str) -> None:
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as cache_file:
+        cache_file.write(text)
+    os.replace(temp_path, cache_path)
+
+
+def ocr_page(pdf_path: str, page_no: int, dpi: int, language: str, cache_folder: str) -> str:
+    """
+    Renders a single PDF page with PyMuPDF and runs it through the local OCR engine.
+
+    The rendered page is hashed together with the DPI and OCR language, and the recognised
+    text is cached under that hash so re-ingesting the same scan never repeats the OCR.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        page_no (int): The 1-based page number to OCR.
+        dpi (int): The resolution used to render the page.
+        language (str): The Tesseract language code(s) to use.
+        cache_folder (str): The folder where OCR results are cached.
+
+    Returns:
+        str: The recognised text of the page.
+
+    Raises:
+        Exception: If rendering or OCR fails for the page.
+    """
+    import pytesseract
+    from PIL import Image
+
+    if ocr_config.get("tesseract_cmd"):
+        pytesseract.pytesseract.tesseract_cmd = ocr_config["tesseract_cmd"]
+
+    try:
+        with fitz.open(pdf_path) as document:
+            pixmap = document[page_no - 1].get_pixmap(dpi=dpi)
+            mode = "RGBA" if pixmap.alpha else "RGB"
+            image = Image.frombytes(mode, (pixmap.width, pixmap.height), pixmap.samples)
+
+        page_hash = hashlib.sha256(pixmap.samples + f"{dpi}:{language}".encode('utf-8')).hexdigest()
+        cache_path = os.path.join(cache_folder, f"{page_hash}.txt")
+        if os.path.isfile(cache_path):
+            return _read_cached_text(cache_path)
+
+        ocr_text = pytesseract.image_to_string(image, lang=language)
+        _write_cached_text(cache_path, ocr_text)
+    except Exception as e:
+        raise Exception(f"Failed to OCR page {page_no} of '{pdf_path}': {e}") from e
+
+    return ocr_text
+
+
+_ocr_executor = None
+_ocr_executor_lock = threading.Lock()
+_tesseract_available = None
+
+
+def tesseract_available() -> bool:
+    """
+    Checks once whether the Tesseract binary that pytesseract drives is installed.
+
+    Returns:
+        bool: True if the `tesseract` command (or `ocr.tesseract_cmd`) is found.
+    """
+    global _tesseract_available
+    if _tesseract_available is None:
+        _tesseract_available = shutil.which(ocr_config.get("tesseract_cmd") or "tesseract") is not None
+        if not _tesseract_available:
+            logger.warning("OCR is enabled, but the Tesseract binary was not found; pages without a text layer are skipped.")
+    return _tesseract_available
+
+
+def get_ocr_executor() -> ProcessPoolExecutor:
+    """
+    Returns the process pool shared by all OCR work, starting it on first use.
+
+    Returns:
+        ProcessPoolExecutor: The shared pool.
+    """
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            # Spawned rather than forked: ingestion threads may be inside PyMuPDF when the pool starts
+            _ocr_executor = ProcessPoolExecutor(max_workers=ocr_config.get("max_workers") or os.cpu_count(),
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _ocr_executor
+
+
+def _reset_ocr_executor(broken: Optional[ProcessPoolExecutor]) -> None:
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is broken:
+            _ocr_executor = None
+
+
+def ocr_pages(pdf_path: str, page_numbers: List[int]) -> Dict[int, str]:
+    """
+    Runs OCR over several pages of a PDF in the shared OCR process pool.
+
+    Pages that fail are logged and left out of the result, so one bad page never aborts the rest.
+    Nothing is run if the Tesseract binary is not installed.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        page_numbers (List[int]): The 1-based page numbers that need OCR.
+
+    Returns:
+        Dict[int, str]: A mapping of page number to recognised text for every page that succeeded.
+    """
+    if not page_numbers or not tesseract_available():
+        return {}
+
+    dpi = ocr_config.get("dpi", 300)
+    language = ocr_config.get("language", "eng")
+    cache_folder = ocr_config.get("cache_directory_name", "ocr_cache")
+    os.makedirs(cache_folder, exist_ok=True)
+
+    logger.info(f"Running OCR on {len(page_numbers)} page(s) of '{pdf_path}' at {dpi} DPI")
+
+    results = {}
+    executor = get_ocr_executor()
+    try:
+        futures = {
+            executor.submit(ocr_page, pdf_path, page_no, dpi, language, cache_folder): page_no
+            for page_no in page_numbers
+        }
+    except BrokenProcessPool as e:
+        # A worker died (e.g. killed for memory); the next call starts a fresh pool
+        logger.error(f"OCR pool is broken, skipping OCR for '{pdf_path}': {e}")
+        _reset_ocr_executor(executor)
+        return results
+
+    for future in as_completed(futures):
+        page_no = futures[future]
+        try:
+            results[page_no] = future.result()
+        except BrokenProcessPool as e:
+            logger.error(f"OCR failed for PDF: '{pdf_path}', Page No: {page_no}. Error: {e}")
+            _reset_ocr_executor(executor)
+        except Exception as e:
+            logger.error(f"OCR failed for PDF: '{pdf_path}', Page No: {page_no}. Error: {e}")
+
+    return results
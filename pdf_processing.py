@@ -3,12 +3,15 @@
 import pdfplumber
 from logging_config import logger
 from typing import Any,List,Tuple
-from vector_database import text_db_insetter,image_db_insetter
+from vector_database import text_db_insetter,image_db_insetter,table_db_insetter
 from image_processing import encode_image_base64
 import fitz
 import os
-from image_processing import image_summary_generator
-from utilities import text_splitter,config
+from image_processing import cached_image_summary
+from utilities import text_splitter,config,fitz_lock
+from ocr_processing import has_usable_text_layer, ocr_pages
+from table_processing import extract_tables_from_page, file_hash
+from work_scheduler import work_checkpoint
 
 def extract_text_from_page(page_data: Any, pdf_name: str, page_no: int) -> str:
     """
@@ -20,7 +23,7 @@ def extract_text_from_page(page_data: Any, pdf_name: str, page_no: int) -> str:
         page_no (int): The page number from which to extract text.
 
     Returns:
-        str: The extracted text from the page.
+        str: The extracted text from the page, or an empty string if the page has no text layer.
 
     Raises:
         Exception: If text extraction fails for any reason.
@@ -30,7 +33,8 @@ def extract_text_from_page(page_data: Any, pdf_name: str, page_no: int) -> str:
     try:
         extracted_text = page_data.extract_text()
         if extracted_text is None:
-            raise ValueError(f"No text could be extracted from page {page_no} of {pdf_name}.")
+            logger.warning(f"No text layer found on page {page_no} of {pdf_name}.")
+            extracted_text = ""
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {pdf_name}, Page No: {page_no}. Error: {e}")
         raise Exception(f"Failed to extract text from page {page_no} of {pdf_name}.") from e
@@ -66,10 +70,51 @@ def extract_images_from_page(page_data: Any, pdf_name: str, page_no: int) -> Lis
     return images
 
 
+def image_surrogate_text(page_data: Any, xref: int, pdf_name: str, page_no: int) -> str:
+    """
+    Builds a cheap text surrogate for an image from its caption and the page text around it.
+
+    Args:
+        page_data (Any): The PyMuPDF page object containing the image.
+        xref (int): The cross-reference number of the image.
+        pdf_name (str): The name of the PDF file being processed.
+        page_no (int): The page number of the image.
+
+    Returns:
+        str: The surrogate text used to index the image until it is summarized.
+    """
+    max_blocks = config["settings"].get("lazy_image_context_blocks", 3)
+    blocks = [block for block in page_data.get_text("blocks") if block[6] == 0 and block[4].strip()]
+    rects = page_data.get_image_rects(xref)
+
+    caption = ""
+    if rects:
+        image_rect = rects[0]
+
+        def distance(block):
+            dy = max(image_rect.y0 - block[3], block[1] - image_rect.y1, 0)
+            dx = max(image_rect.x0 - block[2], block[0] - image_rect.x1, 0)
+            return dx + dy
+
+        blocks.sort(key=distance)
+        caption = next(
+            (" ".join(block[4].split()) for block in blocks
+             if block[1] >= image_rect.y1 - 1 and block[4].lstrip().lower().startswith(("fig", "figure", "image", "chart", "diagram", "table"))),
+            ""
+        )
+
+    nearby_text = " ".join(" ".join(block[4].split()) for block in blocks[:max_blocks])
+    return f"Image on page {page_no} of {pdf_name}. Caption: {caption or 'None'}. Nearby text: {nearby_text or 'None'}"
+
 def PDF_text_processor(pdf_path: str, vector_db: Any, text_chunker: Any) -> None:
     """
     Extracts text from a PDF, splits it into smaller chunks, and inserts the chunks into a vector database.
 
+    Pages without a usable text layer (e.g. scanned pages) are rendered and sent to the local OCR
+    engine when OCR is enabled in the config. When table extraction is enabled, each table found
+    on a page is also inserted as its own compact chunk with `Type: "Table"`. Failures are handled
+    per page, so one bad page does not abort the rest of the document.
+
     Args:
         pdf_path (str): The path to the PDF file.
         vector_db (Any): An instance of the vector database to which documents will be added.
@@ -77,27 +122,76 @@ def PDF_text_processor(pdf_path: str, vector_db: Any, text_chunker: Any) -> None
 
     Raises:
         ValueError: If the PDF path is empty or invalid.
-        Exception: If there is an error while processing the PDF or adding documents to the vector database.
+        Exception: If the PDF cannot be opened.
     """
     if not pdf_path:
         raise ValueError("PDF path cannot be empty.")
 
     logger.info(f"Processing PDF: '{pdf_path}'")
 
+    ocr_settings = config.get("ocr", {})
+    min_text_chars = ocr_settings.get("min_text_chars", 20)
+    extract_tables = config.get("tables", {}).get("enabled", False)
+    page_texts = {}
+    pages_for_ocr = []
+    # Text layers too short to trust, kept in case OCR returns nothing for the page
+    fallback_texts = {}
+
     try:
+        pdf_hash = file_hash(pdf_path) if extract_tables else None
         with pdfplumber.open(pdf_path) as pdf:
             for page_num, page in enumerate(pdf.pages, start=1):
-                extracted_text = extract_text_from_page(page_data=page, pdf_name=pdf_path, page_no=page_num)
-                split_texts = text_splitter(text=extracted_text,text_chunker=text_chunker)
-                text_db_insetter(vector_db=vector_db, texts=split_texts, pdf_name=pdf_path, page_no=page_num)
+                work_checkpoint()
+                if extract_tables:
+                    try:
+                        tables = extract_tables_from_page(page_data=page, pdf_name=pdf_path, page_no=page_num, pdf_hash=pdf_hash)
+                        if tables:
+                            table_db_insetter(vector_db=vector_db, tables=tables, pdf_name=pdf_path, page_no=page_num)
+                    except Exception as e:
+                        logger.error(f"Skipping tables of page {page_num} of '{pdf_path}'. Error: {e}")
+
+                try:
+                    extracted_text = extract_text_from_page(page_data=page, pdf_name=pdf_path, page_no=page_num)
+                except Exception as e:
+                    logger.error(f"Skipping text layer of page {page_num} of '{pdf_path}'. Error: {e}")
+                    extracted_text = ""
+
+                if has_usable_text_layer(extracted_text, min_text_chars):
+                    page_texts[page_num] = extracted_text
+                elif ocr_settings.get("enabled", False):
+                    pages_for_ocr.append(page_num)
+                    if extracted_text.strip():
+                        fallback_texts[page_num] = extracted_text
+                elif extracted_text.strip():
+                    page_texts[page_num] = extracted_text
     except Exception as e:
         logger.error(f"Error processing PDF: '{pdf_path}'. Error: {e}")
         raise Exception(f"Failed to process PDF: '{pdf_path}'.") from e
 
+    work_checkpoint()
+    ocr_texts = ocr_pages(pdf_path, pages_for_ocr)
+    for page_num in pages_for_ocr:
+        if ocr_texts.get(page_num, "").strip():
+            page_texts[page_num] = ocr_texts[page_num]
+        elif page_num in fallback_texts:
+            logger.warning(f"OCR returned no text for page {page_num} of '{pdf_path}'; using its text layer")
+            page_texts[page_num] = fallback_texts[page_num]
+
+    for page_num in sorted(page_texts):
+        try:
+            split_texts = text_splitter(text=page_texts[page_num], text_chunker=text_chunker)
+            text_db_insetter(vector_db=vector_db, texts=split_texts, pdf_name=pdf_path, page_no=page_num)
+        except Exception as e:
+            logger.error(f"Error inserting page {page_num} of '{pdf_path}'. Error: {e}")
+
 def PDF_image_processor(pdf_path: str, output_folder: str, vector_db: Any, openai_client: Any, model_name: str, text_chunker: Any) -> None:
     """
     Processes images from a PDF file, generates summaries, and inserts them into a vector database.
 
+    When `lazy_image_summaries` is enabled in the config, images are only saved and indexed with a
+    surrogate built from their caption and nearby page text; the summary is generated at query time
+    by `LazyImageSummarizer`.
+
     Args:
         pdf_path (str): The path to the PDF file.
         output_folder (str): The folder where extracted images will be saved.
@@ -118,17 +212,25 @@ def PDF_image_processor(pdf_path: str, output_folder: str, vector_db: Any, opena
 
     logger.info(f"Processing PDF for image summaries: '{pdf_path}'")
 
+    lazy_summaries = config["settings"].get("lazy_image_summaries", False)
+
+    document = None
     try:
-        document = fitz.open(pdf_path)
-        for page_num in range(document.page_count):
-            page = document[page_num]
-            images = extract_images_from_page(page_data=page, pdf_name=os.path.basename(pdf_path), page_no=page_num+1)
-
-            for img_index, img in enumerate(images):
-                xref = img[0]
-                base_image = document.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
+        with fitz_lock:
+            document = fitz.open(pdf_path)
+            page_count = document.page_count
+        for page_num in range(page_count):
+            # Pull everything needed from PyMuPDF under the lock, then save, summarize and insert without it
+            with fitz_lock:
+                page = document[page_num]
+                images = []
+                for img in extract_images_from_page(page_data=page, pdf_name=os.path.basename(pdf_path), page_no=page_num+1):
+                    xref = img[0]
+                    base_image = document.extract_image(xref)
+                    surrogate = image_surrogate_text(page, xref, os.path.basename(pdf_path), page_num + 1) if lazy_summaries else None
+                    images.append((base_image["image"], base_image["ext"], surrogate))
+
+            for img_index, (image_bytes, image_ext, surrogate) in enumerate(images):
                 image_filename = f"{output_folder}/{os.path.basename(pdf_path)}_page_{page_num + 1}_image_{img_index + 1}.{image_ext}"
 
                 # Save the extracted image
@@ -136,11 +238,17 @@ def PDF_image_processor(pdf_path: str, output_folder: str, vector_db: Any, opena
                     image_file.write(image_bytes)
                 logger.info(f"Saved image: {image_filename}")
 
+                if lazy_summaries:
+                    image_db_insetter(vector_db, [surrogate], image_filename, os.path.basename(pdf_path), page_no = page_num + 1,
+                                      extra_metadata={"SummaryStatus": "pending"})
+                    logger.info(f"Indexed surrogate for image, summary deferred to query time: {image_filename}")
+                    continue
+
                 # Encode the image to Base64
                 encoded_image = encode_image_base64(image_filename)
 
                 # Generate a summary for the image
-                image_summary = image_summary_generator(encoded_image, model_name, openai_client)
+                image_summary = cached_image_summary(encoded_image, model_name, openai_client)
                 logger.info(f"Successfully generated summary for image: {image_filename}")
 
                 # Apply the text splitter on the image summary
@@ -154,6 +262,10 @@ def PDF_image_processor(pdf_path: str, output_folder: str, vector_db: Any, opena
     except Exception as e:
         logger.error(f"Error processing PDF: '{pdf_path}'. Error: {e}")
         raise Exception(f"Failed to process PDF: '{pdf_path}'.") from e
+    finally:
+        if document is not None:
+            with fitz_lock:
+                document.close()
 def process_pdf(pdf_path: str, output_folder: str, vector_db: Any, openai_client: Any, model_name: str, text_chunker: Any) -> None:
     """
     Processes a single PDF file using the PDF_image_processor and PDF_text_processor.
@@ -0,0 +1,263 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import chromadb
+import pdfplumber
+from langchain.schema import Document
+from langchain_chroma import Chroma
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from logging_config import logger
+from model_router import count_tokens, routing_config
+from text_splitter import TextSplitter
+from txt_processing import text_extracter
+from word_processing import extract_word_sections
+from pdf_processing import extract_text_from_page
+from vector_database import create_retriever
+from sharded_vector_store import create_sharded_vector_store
+from utilities import config, config_section
+
+tuner_config = config_section("tuning")
+
+
+def load_labeled_questions(path: str) -> List[Dict[str, Any]]:
+    """
+    Loads the labeled question set.
+
+    The file is a JSON list of objects with "question", "source" (file name) and "page_no".
+
+    Args:
+        path (str): The path to the labeled question file.
+
+    Returns:
+        List[Dict[str, Any]]: The labeled questions.
+
+    Raises:
+        ValueError: If an entry is missing a required field.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        questions = json.load(file)
+    for entry in questions:
+        if not entry.get("question") or not entry.get("source") or entry.get("page_no") is None:
+            raise ValueError(f"Labeled question is missing 'question', 'source' or 'page_no': {entry}")
+    return questions
+
+
+def build_chunk_size_index(chunk_size: int, chunk_overlap: int, embeddings: Any) -> Chroma:
+    """
+    Builds a temporary in-memory index of the input folder's text at a given chunk size.
+
+    Only text is indexed (PDF text layers, TXT and Word files); images keep the summaries of the
+    main index and do not depend on the chunk size.
+
+    Args:
+        chunk_size (int): The chunk size to evaluate.
+        chunk_overlap (int): The chunk overlap to use.
+        embeddings (Any): The embedding function of the main index.
+
+    Returns:
+        Chroma: The temporary vector store.
+    """
+    chunker = TextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    input_folder = config['settings']['input_folder']
+    documents = []
+
+    for filename in os.listdir(input_folder):
+        file_path = os.path.join(input_folder, filename)
+        try:
+            if filename.lower().endswith('.pdf'):
+                with pdfplumber.open(file_path) as pdf:
+                    pages = [(page_num, extract_text_from_page(page, file_path, page_num)) for page_num, page in enumerate(pdf.pages, start=1)]
+            elif filename.lower().endswith('.txt'):
+                pages = [(1, text_extracter(file_path))]
+            elif filename.lower().endswith('.docx'):
+                pages = [(1, section["text"]) for section in extract_word_sections(file_path)[0]]
+            else:
+                continue
+        except Exception as e:
+            logger.error(f"Skipping {filename} while building chunk size index: {e}")
+            continue
+
+        for page_no, text in pages:
+            documents.extend(
+                Document(page_content=chunk, metadata={"Source": filename, "PageNo": page_no, "Type": "Text"})
+                for chunk in chunker.split_text(text) if chunk.strip()
+            )
+
+    store = Chroma(client=chromadb.EphemeralClient(), collection_name=f"tuning_chunk_size_{chunk_size}", embedding_function=embeddings)
+    if documents:
+        store.add_documents(documents=documents)
+    logger.info(f"Built temporary index with chunk size {chunk_size}: {len(documents)} chunks")
+    return store
+
+
+def evaluate_setting(vector_db: Any, questions: List[Dict[str, Any]], search_type: str, top_k: int, score_threshold: Optional[float], max_images_options: List[int]) -> List[Dict[str, Any]]:
+    """
+    Runs the labeled questions through one retriever setting and scores each max_images option.
+
+    A question counts as recalled when any chunk that would reach the prompt comes from the
+    expected source and page.
+
+    Args:
+        vector_db (Any): The vector store to search.
+        questions (List[Dict[str, Any]]): The labeled questions.
+        search_type (str): The retriever search type.
+        top_k (int): The number of chunks to retrieve.
+        score_threshold (Optional[float]): The score threshold for 'similarity_score_threshold'.
+        max_images_options (List[int]): The max_images values to score.
+
+    Returns:
+        List[Dict[str, Any]]: One result per max_images option with recall, mean context tokens and p95 latency.
+    """
+    retriever = create_retriever(vector_db, search_type, top_k, score_threshold)
+    tokens_per_image = routing_config.get("tokens_per_image", 765)
+
+    latencies = []
+    retrieved = []
+    for entry in questions:
+        start = time.perf_counter()
+        documents = retriever.invoke(input=entry["question"])
+        latencies.append(time.perf_counter() - start)
+        retrieved.append(documents)
+
+    latencies.sort()
+    p95_latency = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+
+    results = []
+    for max_images in max_images_options:
+        hits = 0
+        total_tokens = 0
+        for entry, documents in zip(questions, retrieved):
+            images = [doc for doc in documents if doc.metadata.get("Type") == "Image"]
+            image_paths = list(dict.fromkeys(doc.metadata.get("ImagePath") for doc in images))[:max_images]
+            used = [doc for doc in documents if doc.metadata.get("Type") != "Image"]
+            used += [doc for doc in images if doc.metadata.get("ImagePath") in image_paths]
+
+            total_tokens += sum(count_tokens(doc.page_content) for doc in used if doc.metadata.get("Type") != "Image")
+            total_tokens += len(image_paths) * tokens_per_image
+            if any(doc.metadata.get("Source") == entry["source"] and doc.metadata.get("PageNo") == entry["page_no"] for doc in used):
+                hits += 1
+
+        results.append({
+            "search_algorithm": search_type,
+            "top_k": top_k,
+            "score_threshold": score_threshold,
+            "max_images": max_images,
+            "recall_at_k": hits / len(questions),
+            "mean_context_tokens": total_tokens / len(questions),
+            "p95_latency_seconds": p95_latency,
+        })
+    return results
+
+
+def pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Returns the settings not dominated on (higher recall, fewer context tokens, lower p95 latency).
+
+    Args:
+        results (List[Dict[str, Any]]): The evaluated settings.
+
+    Returns:
+        List[Dict[str, Any]]: The Pareto-optimal settings, best recall first.
+    """
+    def dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        no_worse = (a["recall_at_k"] >= b["recall_at_k"] and a["mean_context_tokens"] <= b["mean_context_tokens"]
+                    and a["p95_latency_seconds"] <= b["p95_latency_seconds"])
+        better = (a["recall_at_k"] > b["recall_at_k"] or a["mean_context_tokens"] < b["mean_context_tokens"]
+                  or a["p95_latency_seconds"] < b["p95_latency_seconds"])
+        return no_worse and better
+
+    front = [result for result in results if not any(dominates(other, result) for other in results)]
+    return sorted(front, key=lambda result: (-result["recall_at_k"], result["mean_context_tokens"], result["p95_latency_seconds"]))
+
+
+def write_config(best: Dict[str, Any], config_path: str = 'config.json') -> None:
+    """
+    Writes the chosen retriever (and chunk size, if it was swept) settings back to config.json.
+
+    Args:
+        best (Dict[str, Any]): The chosen setting.
+        config_path (str): The path to the configuration file.
+    """
+    with open(config_path, 'r') as config_file:
+        updated = json.load(config_file)
+
+    retriever_settings = updated["VectorDB"]["retriever"]
+    retriever_settings["search_algorithm"] = best["search_algorithm"]
+    retriever_settings["top_k"] = best["top_k"]
+    retriever_settings["max_images"] = best["max_images"]
+    retriever_settings["score_threshold"] = best["score_threshold"]
+    if best.get("chunk_size") is not None:
+        updated["text_splitter"]["chunk_size"] = best["chunk_size"]
+
+    with open(config_path, 'w', newline='\r\n') as config_file:
+        json.dump(updated, config_file, indent=4)
+        config_file.write("\n")
+    logger.info(f"Wrote tuned retriever settings to {config_path}")
+
+
+def tune(questions: List[Dict[str, Any]], chunk_sizes: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Sweeps retriever settings (and optionally chunk sizes) and returns every evaluated setting.
+
+    Args:
+        questions (List[Dict[str, Any]]): The labeled questions.
+        chunk_sizes (Optional[List[int]]): Chunk sizes to evaluate on temporary indexes; None to use the main index only.
+
+    Returns:
+        List[Dict[str, Any]]: The evaluated settings.
+    """
+    embeddings = HuggingFaceEmbeddings(model_name=config["VectorDB"]["embedding_model_name"])
+    search_types = tuner_config.get("search_algorithms", ['similarity', 'similarity_score_threshold', 'mmr'])
+    top_k_options = tuner_config.get("top_k", [2, 3, 5, 8, 10])
+    threshold_options = tuner_config.get("score_thresholds", [0.3, 0.5, 0.7])
+    max_images_options = tuner_config.get("max_images", [0, 2, 5, 10])
+
+    if chunk_sizes:
+        overlap = config["text_splitter"]["chunk_overlap"]
+        indexes = [(chunk_size, build_chunk_size_index(chunk_size, overlap, embeddings)) for chunk_size in chunk_sizes]
+    else:
+        client = chromadb.PersistentClient(path=config["VectorDB"]["vector_db_persist_directory_name"])
+        if config["VectorDB"].get("sharding", {}).get("enabled", False):
+            indexes = [(None, create_sharded_vector_store(client, embeddings))]
+        else:
+            indexes = [(None, Chroma(client=client, collection_name=config["VectorDB"]["collection_name"], embedding_function=embeddings))]
+
+    results = []
+    for chunk_size, vector_db in indexes:
+        for search_type, top_k in itertools.product(search_types, top_k_options):
+            thresholds = threshold_options if search_type == 'similarity_score_threshold' else [None]
+            for score_threshold in thresholds:
+                for result in evaluate_setting(vector_db, questions, search_type, top_k, score_threshold, max_images_options):
+                    result["chunk_size"] = chunk_size
+                    results.append(result)
+                    logger.info(f"Evaluated {result}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tune retriever parameters against a labeled question set.")
+    parser.add_argument("labeled_questions", help="JSON file with a list of {question, source, page_no} entries.")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+",
+                        help="Also sweep these chunk sizes, re-chunking the input folder into temporary indexes.")
+    parser.add_argument("--write", action="store_true", help="Write the Pareto-best setting back to config.json.")
+    args = parser.parse_args()
+
+    results = tune(load_labeled_questions(args.labeled_questions), args.chunk_sizes)
+    front = pareto_front(results)
+
+    print(f"{'chunk':>6} {'search_algorithm':<27} {'top_k':>5} {'thresh':>6} {'images':>6} {'recall':>7} {'tokens':>8} {'p95 ms':>8}")
+    for result in front:
+        print(f"{result['chunk_size'] or '-':>6} {result['search_algorithm']:<27} {result['top_k']:>5} "
+              f"{result['score_threshold'] if result['score_threshold'] is not None else '-':>6} {result['max_images']:>6} "
+              f"{result['recall_at_k']:>7.2%} {result['mean_context_tokens']:>8.0f} {result['p95_latency_seconds'] * 1000:>8.1f}")
+
+    if args.write and front:
+        write_config(front[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_chroma import Chroma
+from logging_config import logger
+from utilities import config, config_section
+from vector_database import embed_queries, query_collection_batch
+
+sharding_config = config_section("VectorDB", "sharding")
+
+VALID_STRATEGIES = ['source', 'hash', 'date']
+
+
+def _stable_hash(value: str) -> int:
+    return int(hashlib.md5(value.encode('utf-8')).hexdigest(), 16)
+
+
+class ShardedVectorStore:
+    """
+    A vector store made of several Chroma collections ("shards").
+
+    Chunks are routed to a shard by source document, content hash or ingestion month. Queries
+    fan out to every shard in parallel and the per-shard results are merged by relevance score,
+    so each shard stays small and can be rebuilt on its own while the others keep serving.
+    """
+
+    def __init__(self, client: Any, embedding_function: Any, base_name: str, strategy: str = "source", num_shards: int = 8, max_workers: Optional[int] = None):
+        if strategy not in VALID_STRATEGIES:
+            raise ValueError(f"Invalid sharding strategy '{strategy}'. Valid values are: {VALID_STRATEGIES}")
+        if strategy != "date" and num_shards < 1:
+            raise ValueError("Number of shards must be a positive integer.")
+
+        self.client = client
+        self.embedding_function = embedding_function
+        self.base_name = base_name
+        self.strategy = strategy
+        self.num_shards = num_shards
+        self.shards = {}
+        self._lock = threading.Lock()
+
+        if strategy == "date":
+            # Date shards are created on demand, so pick up the ones that already exist
+            for collection in client.list_collections():
+                name = getattr(collection, "name", collection)
+                if name.startswith(f"{base_name}_") and name[len(base_name) + 1:].isdigit():
+                    self.get_shard(name)
+        else:
+            for index in range(num_shards):
+                self.get_shard(f"{base_name}_shard_{index}")
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or max(len(self.shards), 1))
+
+    def get_shard(self, name: str) -> Chroma:
+        """
+        Returns the store for a shard, creating its collection if needed.
+
+        Args:
+            name (str): The shard's collection name.
+
+        Returns:
+            Chroma: The shard's vector store.
+        """
+        with self._lock:
+            if name not in self.shards:
+                self.shards[name] = Chroma(client=self.client, collection_name=name, embedding_function=self.embedding_function)
+            return self.shards[name]
+
+    def shard_name_for(self, document: Document) -> str:
+        """
+        Returns the name of the shard a document belongs to under the configured strategy.
+
+        Args:
+            document (Document): The document to route.
+
+        Returns:
+            str: The shard's collection name.
+        """
+        if self.strategy == "date":
+            ingested_at = document.metadata.get("IngestedAt") or datetime.now(timezone.utc).strftime("%Y%m")
+            return f"{self.base_name}_{str(ingested_at).replace('-', '')[:6]}"
+        key = document.metadata.get("Source", "") if self.strategy == "source" else document.page_content
+        return f"{self.base_name}_shard_{_stable_hash(key) % self.num_shards}"
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> None:
+        """
+        Routes documents to their shards and inserts them.
+
+        Args:
+            documents (List[Document]): The documents to insert.
+            ids (Optional[List[str]]): Explicit chunk ids, one per document.
+        """
+        by_shard = {}
+        for index, document in enumerate(documents):
+            shard_documents, shard_ids = by_shard.setdefault(self.shard_name_for(document), ([], []))
+            shard_documents.append(document)
+            if ids is not None:
+                shard_ids.append(ids[index])
+        for name, (shard_documents, shard_ids) in by_shard.items():
+            self.get_shard(name).add_documents(documents=shard_documents, ids=shard_ids or None)
+
+    def upsert(self, ids: List[str], metadatas: List[dict], documents: List[str]) -> None:
+        """
+        Routes chunks to their shards and inserts or replaces them, with the same arguments as a
+        Chroma collection's `upsert`.
+
+        Args:
+            ids (List[str]): The chunk ids.
+            metadatas (List[dict]): The metadata, one per chunk.
+            documents (List[str]): The chunk texts, one per chunk.
+        """
+        by_shard = {}
+        for chunk_id, metadata, text in zip(ids, metadatas, documents):
+            shard_name = self.shard_name_for(Document(page_content=text, metadata=metadata))
+            shard_ids, shard_metadatas, shard_texts = by_shard.setdefault(shard_name, ([], [], []))
+            shard_ids.append(chunk_id)
+            shard_metadatas.append(metadata)
+            shard_texts.append(text)
+        for name, (shard_ids, shard_metadatas, shard_texts) in by_shard.items():
+            # Shard collections have no embedding function of their own; langchain embeds for them
+            self.get_shard(name)._collection.upsert(ids=shard_ids, metadatas=shard_metadatas, documents=shard_texts,
+                                                    embeddings=self.embedding_function.embed_documents(shard_texts))
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> Dict[str, List[Any]]:
+        """
+        Fetches matching chunks from every shard, in the same shape as `Chroma.get`.
+
+        Args:
+            ids (Optional[List[str]]): The ids of the chunks to fetch.
+            where (Optional[Dict[str, Any]]): A Chroma metadata filter.
+
+        Returns:
+            Dict[str, List[Any]]: The merged "ids", "documents" and "metadatas" lists.
+        """
+        with self._lock:
+            shards = list(self.shards.values())
+        merged = {"ids": [], "documents": [], "metadatas": []}
+        for store in shards:
+            result = store.get(ids=ids, where=where)
+            for key in merged:
+                merged[key].extend(result.get(key) or [])
+        return merged
+
+    def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        """
+        Replaces the metadata of chunks in whichever shards hold them.
+
+        Args:
+            ids (List[str]): The ids of the chunks to update.
+            metadatas (List[dict]): The new metadata, one per id.
+        """
+        with self._lock:
+            shards = list(self.shards.values())
+        updates = dict(zip(ids, metadatas))
+        for store in shards:
+            held = store.get(ids=list(updates))["ids"]
+            if held:
+                store._collection.update(ids=held, metadatas=[updates[chunk_id] for chunk_id in held])
+
+    def delete(self, ids: List[str]) -> None:
+        """
+        Deletes chunks by id from every shard; ids that a shard does not hold are ignored.
+
+        Args:
+            ids (List[str]): The ids of the chunks to delete.
+        """
+        with self._lock:
+            shards = list(self.shards.values())
+        for store in shards:
+            store.delete(ids=ids)
+
+    def rebuild_shard(self, name: str, documents: List[Document], ids: List[str]) -> None:
+        """
+        Rebuilds a single shard from scratch while the current copy keeps serving queries.
+
+        The new copy is built in a temporary collection and swapped in once it is complete.
+        Chunks keep their ids, so the side indexes (text store, near-duplicates, adjacency) still
+        point at them.
+
+        Args:
+            name (str): The shard's collection name.
+            documents (List[Document]): The full set of documents that belong to the shard.
+            ids (List[str]): The chunk ids, one per document.
+
+        Raises:
+            ValueError: If the number of ids does not match the number of documents.
+        """
+        if len(ids) != len(documents):
+            raise ValueError("Exactly one id is required per document.")
+        temp_name = f"{name}__rebuild"
+        logger.info(f"Rebuilding shard '{name}' with {len(documents)} documents")
+
+        try:
+            self.client.delete_collection(temp_name)
+        except Exception:
+            pass
+        rebuilt = Chroma(client=self.client, collection_name=temp_name, embedding_function=self.embedding_function)
+        if documents:
+            rebuilt.add_documents(documents=documents, ids=ids)
+
+        with self._lock:
+            self.shards[name] = rebuilt
+        try:
+            self.client.delete_collection(name)
+        except Exception:
+            pass
+        self.client.get_collection(temp_name).modify(name=name)
+        with self._lock:
+            self.shards[name] = Chroma(client=self.client, collection_name=name, embedding_function=self.embedding_function)
+        logger.info(f"Shard '{name}' rebuilt")
+
+    def _search_shard(self, name: str, store: Chroma, query: str, search_type: str, search_kwargs: Dict[str, Any]) -> List[Tuple[Document, float]]:
+        k = search_kwargs.get("k", 4)
+        try:
+            if search_type == "mmr":
+                documents = store.max_marginal_relevance_search(query, k=k, fetch_k=search_kwargs.get("fetch_k", 20))
+                # MMR results carry no comparable score; rank them by position within the shard
+                return [(document, -rank) for rank, document in enumerate(documents)]
+            return store.similarity_search_with_relevance_scores(query, k=k, score_threshold=search_kwargs.get("score_threshold"))
+        except Exception as e:
+            logger.error(f"Error querying shard '{name}': {e}")
+            return []
+
+    def search(self, query: str, search_type: str, search_kwargs: Dict[str, Any]) -> List[Document]:
+        """
+        Queries all shards in parallel and merges the top-k results by score.
+
+        Args:
+            query (str): The query text.
+            search_type (str): One of 'similarity', 'similarity_score_threshold' or 'mmr'.
+            search_kwargs (Dict[str, Any]): Search arguments; `k` is the number of results to return.
+
+        Returns:
+            List[Document]: The merged top-k documents.
+        """
+        with self._lock:
+            shards = list(self.shards.items())
+        futures = [
+            self.executor.submit(self._search_shard, name, store, query, search_type, search_kwargs)
+            for name, store in shards
+        ]
+        scored = [result for future in futures for result in future.result()]
+        scored.sort(key=lambda result: result[1], reverse=True)
+        return [document for document, _ in scored[:search_kwargs.get("k", 4)]]
+
+    def search_batch(self, queries: List[str], k: int) -> List[List[Document]]:
+        """
+        Embeds all queries in one call, runs one batched query per shard in parallel, and merges
+        the top-k hits per query by distance.
+
+        Args:
+            queries (List[str]): The query texts.
+            k (int): The number of results to return per query.
+
+        Returns:
+            List[List[Document]]: The merged top-k documents for each query.
+        """
+        query_embeddings = embed_queries(self.embedding_function, queries)
+        documents_by_id = {}
+        with self._lock:
+            shards = list(self.shards.items())
+
+        def search(name: str, store: Chroma) -> List[List[Tuple[Document, float]]]:
+            try:
+                return query_collection_batch(store._collection, query_embeddings, k, documents_by_id)
+            except Exception as e:
+                logger.error(f"Error querying shard '{name}': {e}")
+                return [[] for _ in queries]
+
+        shard_hits = list(self.executor.map(lambda shard: search(*shard), shards))
+        merged = []
+        for query_index in range(len(queries)):
+            hits = [hit for hits in shard_hits for hit in hits[query_index]]
+            hits.sort(key=lambda hit: hit[1])
+            merged.append([document for document, _ in hits[:k]])
+        return merged
+
+    def as_retriever(self, search_type: str, search_kwargs: Dict[str, Any]) -> "ShardedRetriever":
+        return ShardedRetriever(self, search_type, search_kwargs)
+
+
+class ShardedRetriever:
+    """
+    Retriever over a ShardedVectorStore, exposing the same `invoke` call as langchain retrievers.
+    """
+
+    def __init__(self, store: ShardedVectorStore, search_type: str, search_kwargs: Dict[str, Any]):
+        self.store = store
+        self.search_type = search_type
+        self.search_kwargs = search_kwargs
+
+    def invoke(self, input: str) -> List[Document]:
+        return self.store.search(input, self.search_type, self.search_kwargs)
+
+
+def create_sharded_vector_store(client: Any, embedding_function: Any) -> ShardedVectorStore:
+    """
+    Creates a ShardedVectorStore from the `VectorDB.sharding` section of config.json.
+
+    Args:
+        client (Any): The chromadb client holding the shard collections.
+        embedding_function (Any): The embedding function shared by all shards.
+
+    Returns:
+        ShardedVectorStore: The sharded store.
+    """
+    return ShardedVectorStore(
+        client=client,
+        embedding_function=embedding_function,
+        base_name=config["VectorDB"]["collection_name"],
+        strategy=sharding_config.get("strategy", "source"),
+        num_shards=sharding_config.get("num_shards", 8),
+        max_workers=sharding_config.get("max_workers"),
+    )
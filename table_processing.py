@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from typing import Any, List, Optional
+
+from logging_config import logger
+from model_router import count_tokens
+from utilities import config_section
+
+table_config = config_section("tables")
+
+
+def file_hash(file_path: str) -> str:
+    """
+    Computes the SHA-256 hash of a file's contents.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def format_table(table: List[List[Optional[str]]]) -> str:
+    """
+    Formats an extracted table as a compact header-plus-rows text block.
+
+    Args:
+        table (List[List[Optional[str]]]): The table rows, the first row being the header.
+
+    Returns:
+        str: The table as pipe-separated lines, or an empty string if the table has no data rows.
+    """
+    rows = [
+        [" ".join((cell or "").split()) for cell in row]
+        for row in table
+        if row and any(cell and cell.strip() for cell in row)
+    ]
+    if len(rows) < 2:
+        return ""
+    return "\n".join(" | ".join(row) for row in rows)
+
+
+def split_table(table: str, max_tokens: int) -> List[str]:
+    """
+    Splits a formatted table into chunks of whole rows, repeating the header row in each chunk.
+
+    Keeps large tables within the embedding model's input limit (rows past it would not be
+    embedded) and lets retrieval return only the rows that match, not the whole table.
+
+    Args:
+        table (str): The table as formatted by `format_table`, the first line being the header.
+        max_tokens (int): The maximum number of tokens per chunk; a single row longer than this
+            becomes a chunk of its own.
+
+    Returns:
+        List[str]: The table chunks, or the table itself if it already fits.
+    """
+    if not max_tokens or count_tokens(table) <= max_tokens:
+        return [table]
+
+    header, *rows = table.split("\n")
+    header_tokens = count_tokens(header) + 1
+    chunks = []
+    current, current_tokens = [], header_tokens
+    for row in rows:
+        row_tokens = count_tokens(row) + 1
+        if current and current_tokens + row_tokens > max_tokens:
+            chunks.append("\n".join([header, *current]))
+            current, current_tokens = [], header_tokens
+        current.append(row)
+        current_tokens += row_tokens
+    if current:
+        chunks.append("\n".join([header, *current]))
+    return chunks
+
+
+def extract_tables_from_page(page_data: Any, pdf_name: str, page_no: int, pdf_hash: str) -> List[str]:
+    """
+    Extracts the tables of a pdfplumber page as compact text blocks, caching the result per page.
+
+    Args:
+        page_data (Any): The pdfplumber page object from which to extract tables.
+        pdf_name (str): The name of the PDF file being processed.
+        page_no (int): The page number from which to extract tables.
+        pdf_hash (str): The content hash of the PDF, used as part of the cache key.
+
+    Returns:
+        List[str]: The formatted tables found on the page, large tables split into groups of rows
+            (see `split_table`).
+
+    Raises:
+        Exception: If table extraction fails for any reason.
+    """
+    cache_folder = table_config.get("cache_directory_name", "table_cache")
+    os.makedirs(cache_folder, exist_ok=True)
+    cache_path = os.path.join(cache_folder, f"{pdf_hash}_page_{page_no}.json")
+
+    max_chunk_tokens = table_config.get("max_chunk_tokens", 200)
+
+    if os.path.isfile(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as cache_file:
+            # The cache holds whole tables, so changing max_chunk_tokens needs no re-extraction
+            return [chunk for table in json.load(cache_file) for chunk in split_table(table, max_chunk_tokens)]
+
+    logger.info(f"Extracting tables from PDF: {pdf_name}, Page No: {page_no}")
+
+    try:
+        tables = [format_table(table) for table in page_data.extract_tables()]
+        tables = [table for table in tables if table]
+    except Exception as e:
+        logger.error(f"Error extracting tables from PDF: {pdf_name}, Page No: {page_no}. Error: {e}")
+        raise Exception(f"Failed to extract tables from page {page_no} of {pdf_name}.") from e
+
+    with open(cache_path, 'w', encoding='utf-8') as cache_file:
+        json.dump(tables, cache_file)
+
+    return [chunk for table in tables for chunk in split_table(table, max_chunk_tokens)]
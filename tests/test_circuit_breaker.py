@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("httpx")
+
+from llm_client import CircuitBreaker, CircuitOpenError
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure("chat")
+    breaker.before_call("chat")
+    breaker.record_failure("chat")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("chat")
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure("chat")
+    breaker.record_success()
+    breaker.record_failure("chat")
+    breaker.before_call("chat")
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure("chat")
+    time.sleep(0.06)
+    breaker.before_call("chat")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("chat")
+    breaker.record_success()
+    breaker.before_call("chat")
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure("chat")
+    time.sleep(0.06)
+    breaker.before_call("chat")
+    breaker.record_failure("chat")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("chat")
@@ -0,0 +1,79 @@
+import tarfile
+
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+pytest.importorskip("langchain")
+pytest.importorskip("tiktoken")
+
+from index_snapshot import export_snapshot, import_snapshot
+from utilities import config
+
+
+@pytest.fixture
+def source_index(tmp_path, monkeypatch):
+    # Keep the snapshot's image folders out of the project directory
+    monkeypatch.setitem(config["settings"], "image_directory_name", str(tmp_path / "images"))
+    monkeypatch.setitem(config["settings"], "image_summary_cache_directory_name", str(tmp_path / "summaries"))
+    (tmp_path / "summaries").mkdir()
+    (tmp_path / "summaries" / "abc.txt").write_text("a cached summary")
+
+    client = chromadb.PersistentClient(path=str(tmp_path / "source"))
+    collection = client.create_collection("docs")
+    collection.add(
+        ids=[f"chunk-{number}" for number in range(5)],
+        documents=[f"text of chunk {number}" for number in range(5)],
+        metadatas=[{"Source": "a.pdf" if number < 3 else "b.pdf", "PageNo": number + 1} for number in range(5)],
+        embeddings=[[float(number), 1.0, 0.5] for number in range(5)],
+    )
+    return tmp_path
+
+
+def _rows(collection):
+    result = collection.get(include=["documents", "metadatas", "embeddings"])
+    return sorted(
+        (chunk_id, document, metadata["Source"], metadata["PageNo"], [float(value) for value in embedding])
+        for chunk_id, document, metadata, embedding in zip(result["ids"], result["documents"], result["metadatas"], result["embeddings"])
+    )
+
+
+def test_round_trip_restores_chunks_and_side_files(source_index):
+    snapshot_path = str(source_index / "index.snapshot")
+    manifest = export_snapshot(str(source_index / "source"), "docs", snapshot_path, batch_size=2)
+    assert manifest["chunk_count"] == 5
+    assert manifest["sources"] == {"a.pdf": 3, "b.pdf": 2}
+
+    (source_index / "summaries" / "abc.txt").unlink()
+    import_snapshot(snapshot_path, str(source_index / "target"), "docs")
+
+    source = chromadb.PersistentClient(path=str(source_index / "source")).get_collection("docs")
+    target = chromadb.PersistentClient(path=str(source_index / "target")).get_collection("docs")
+    assert _rows(target) == _rows(source)
+    assert (source_index / "summaries" / "abc.txt").read_text() == "a cached summary"
+
+
+def test_refuses_non_empty_target_unless_forced(source_index):
+    snapshot_path = str(source_index / "index.snapshot")
+    export_snapshot(str(source_index / "source"), "docs", snapshot_path)
+
+    with pytest.raises(ValueError):
+        import_snapshot(snapshot_path, str(source_index / "source"), "docs")
+    import_snapshot(snapshot_path, str(source_index / "source"), "docs", force=True)
+    assert chromadb.PersistentClient(path=str(source_index / "source")).get_collection("docs").count() == 5
+
+
+def test_incomplete_snapshot_leaves_target_untouched(source_index):
+    snapshot_path = str(source_index / "index.snapshot")
+    export_snapshot(str(source_index / "source"), "docs", snapshot_path, batch_size=2)
+
+    # Drop one chunk batch (and its checksum) from the archive
+    truncated_path = str(source_index / "truncated.snapshot")
+    with tarfile.open(snapshot_path, "r:gz") as source, tarfile.open(truncated_path, "w:gz") as target:
+        for member in source.getmembers():
+            if "part-00001" not in member.name:
+                target.addfile(member, source.extractfile(member))
+
+    with pytest.raises(ValueError):
+        import_snapshot(truncated_path, str(source_index / "target"), "docs")
+    names = [getattr(collection, "name", collection) for collection in chromadb.PersistentClient(path=str(source_index / "target")).list_collections()]
+    assert names == []
@@ -0,0 +1,66 @@
+import pytest
+
+from near_duplicates import NearDuplicateIndex
+
+DISCLAIMER = ("This document is provided for information purposes only and does not constitute an offer "
+              "or solicitation to buy or sell any security or financial instrument in any jurisdiction.")
+
+
+@pytest.fixture
+def index():
+    return NearDuplicateIndex(":memory:", num_perm=64, bands=16, threshold=0.8, shingle_size=3)
+
+
+def test_permutations_must_split_into_bands():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(":memory:", num_perm=100, bands=16)
+
+
+def test_signature_is_deterministic(index):
+    other = NearDuplicateIndex(":memory:", num_perm=64, bands=16, shingle_size=3)
+    assert index.signature(DISCLAIMER) == other.signature(DISCLAIMER)
+
+
+def test_finds_near_duplicate_in_index(index):
+    index.add({"c1": index.signature(DISCLAIMER)})
+    assert index.find_duplicate(index.signature(DISCLAIMER.replace("any jurisdiction", "any jurisdictions"))) == "c1"
+
+
+def test_ignores_unrelated_text(index):
+    index.add({"c1": index.signature(DISCLAIMER)})
+    assert index.find_duplicate(index.signature("Quarterly revenue grew by twelve percent on strong demand in Europe.")) is None
+
+
+def test_finds_near_duplicate_among_pending(index):
+    signature = index.signature(DISCLAIMER)
+    assert index.find_duplicate(signature, {"pending": signature}) == "pending"
+
+
+def test_re_adding_a_signature_keeps_buckets_unique(index):
+    signature = index.signature(DISCLAIMER)
+    index.add({"c1": signature})
+    index.add({"c1": signature})
+    assert index.connection.execute("SELECT COUNT(*) FROM buckets").fetchone()[0] == index.bands
+
+
+def test_remove_drops_chunk(index):
+    index.add({"c1": index.signature(DISCLAIMER)})
+    index.remove(["c1"])
+    assert index.find_duplicate(index.signature(DISCLAIMER)) is None
+
+
+def test_remove_source_returns_remaining_occurrences_oldest_first(index):
+    index.add_occurrences([("c1", "a.pdf", 1), ("c1", "b.pdf", 3), ("c1", "c.pdf", 5), ("c2", "b.pdf", 4)])
+    remaining = index.remove_source("b.pdf")
+    assert remaining == {
+        "c1": [{"pdf_name": "a.pdf", "page_no": 1}, {"pdf_name": "c.pdf", "page_no": 5}],
+        "c2": [],
+    }
+
+
+def test_occurrences_of_is_limited_but_counts_all(index):
+    index.add_occurrences([("c1", f"doc{number}.pdf", 1) for number in range(25)])
+    occurrences, total = index.occurrences_of("c1", 10)
+    assert total == 25
+    assert occurrences[0] == {"pdf_name": "doc0.pdf", "page_no": 1}
+    assert len(occurrences) == 10
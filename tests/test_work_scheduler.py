@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from work_scheduler import WorkScheduler
+
+
+def make_scheduler(**kwargs):
+    limits = {"interactive": {"concurrency": 2}, "batch": {"concurrency": 1}, "ingest": {"concurrency": 2}}
+    return WorkScheduler(limits, latency_target_seconds=1.0, **kwargs)
+
+
+def test_rejects_unknown_classes_and_spans():
+    with pytest.raises(ValueError):
+        WorkScheduler({"bulk": {}}, latency_target_seconds=1.0)
+    with pytest.raises(ValueError):
+        make_scheduler(latency_span="answer")
+    with pytest.raises(ValueError):
+        with make_scheduler().slot("bulk"):
+            pass
+
+
+def test_nested_slots_do_not_take_concurrency_again():
+    scheduler = make_scheduler()
+    with scheduler.slot("ingest"):
+        with scheduler.slot("ingest"):
+            scheduler.checkpoint()
+            assert scheduler.snapshot()["running"]["ingest"] == 1
+    assert scheduler.snapshot()["running"]["ingest"] == 0
+
+
+def test_concurrency_limit_blocks_until_slot_is_released():
+    scheduler = make_scheduler()
+    entered = threading.Event()
+
+    def worker():
+        with scheduler.slot("batch"):
+            entered.set()
+
+    with scheduler.slot("batch"):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not entered.wait(0.2)
+    assert entered.wait(2)
+    thread.join()
+
+
+def test_ingest_pauses_while_query_latency_is_high():
+    scheduler = make_scheduler(latency_window_seconds=1.0, pause_factor=2.0)
+    scheduler.record_query_latency(5.0)
+    started = time.monotonic()
+    with scheduler.slot("ingest"):
+        waited = time.monotonic() - started
+    assert waited >= 0.9
+    assert scheduler.snapshot()["ingest_state"] == "normal"
+
+
+def test_ticket_records_latency_once_at_mark():
+    scheduler = make_scheduler()
+    with scheduler.slot("interactive") as ticket:
+        ticket.mark()
+        time.sleep(0.1)
+    latencies = [latency for _, latency in scheduler.query_latencies]
+    assert len(latencies) == 1
+    assert latencies[0] < 0.1
+
+
+def test_unmarked_ticket_records_at_slot_exit():
+    scheduler = make_scheduler()
+    with scheduler.slot("interactive"):
+        time.sleep(0.05)
+    assert [latency >= 0.05 for _, latency in scheduler.query_latencies] == [True]
+
+
+def test_rate_limit_spaces_requests():
+    scheduler = WorkScheduler({"batch": {"concurrency": 4, "requests_per_minute": 600, "burst": 1}}, latency_target_seconds=1.0)
+    started = time.monotonic()
+    for _ in range(3):
+        with scheduler.slot("batch"):
+            pass
+    assert time.monotonic() - started >= 0.18
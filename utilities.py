@@ -1,7 +1,13 @@
-from typing import Any, List
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 import json
+import threading
 from logging_config import logger
 
+# PyMuPDF is not thread-safe; every fitz call in this process must hold this lock
+fitz_lock = threading.RLock()
+
+T = TypeVar("T")
+
 def text_splitter(text: str, text_chunker: Any) -> List[str]:
     """
     Splits a given text into smaller chunks using a text splitter.
@@ -48,4 +54,47 @@ def load_config(config_path='config.json'):
         logger.error(f"Error loading configuration: {e}")
         return None
 
-config = load_config()
\ No newline at end of file
+config = load_config()
+
+def config_section(*path: str) -> Dict[str, Any]:
+    """
+    Returns a section of config.json, e.g. config_section("VectorDB", "sharding").
+
+    Args:
+        *path (str): The keys leading to the section.
+
+    Returns:
+        Dict[str, Any]: The section, or an empty dict if it is missing or the config failed to load.
+    """
+    section = config or {}
+    for key in path:
+        section = section.get(key) or {}
+    return section
+
+def shared_if_enabled(section: Dict[str, Any], create: Callable[[], T]) -> Callable[[], Optional[T]]:
+    """
+    Builds the getter of a process-wide instance of an optional feature.
+
+    The instance is created by `create` on first use and then shared by all threads. The getter
+    returns None while the feature's config section does not set "enabled": true.
+
+    Args:
+        section (Dict[str, Any]): The feature's config section.
+        create (Callable[[], T]): Creates the instance.
+
+    Returns:
+        Callable[[], Optional[T]]: The getter.
+    """
+    instance = None
+    lock = threading.Lock()
+
+    def get() -> Optional[T]:
+        nonlocal instance
+        if not section.get("enabled", False):
+            return None
+        with lock:
+            if instance is None:
+                instance = create()
+            return instance
+
+    return get
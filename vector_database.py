@@ -1,10 +1,35 @@
 from langchain.schema import Document
-from typing import Any, List
+from typing import Any, Dict, List, Optional, Tuple
 import os
+import json
+import uuid
 from logging_config import logger
 from utilities import config
+from near_duplicates import get_duplicate_index
+from chunk_store import ChunkRecord, get_text_store
+from chunk_adjacency import get_adjacency_index
+from model_router import count_tokens
+from work_scheduler import work_checkpoint
 
-def image_db_insetter(vector_db: Any, image_summaries_texts: List[str], image_path: str, pdf_name: str, page_no: int) -> None:
+def add_chunks(vector_db: Any, documents: List[Document], ids: Optional[List[str]] = None) -> None:
+    # Embedding and writing are the bulk of ingestion; hold them while ingestion is paused
+    work_checkpoint()
+    text_store = get_text_store()
+    if text_store is None:
+        if ids is None:
+            vector_db.add_documents(documents=documents)
+        else:
+            vector_db.add_documents(documents=documents, ids=ids)
+        return
+
+    # Keep the full text in the side store, keyed by chunk id, so retrieval can load it lazily
+    ids = ids or [str(uuid.uuid4()) for _ in documents]
+    for document in documents:
+        document.metadata["TokenCount"] = count_tokens(document.page_content)
+    text_store.put_many(zip(ids, (document.page_content for document in documents)))
+    vector_db.add_documents(documents=documents, ids=ids)
+
+def image_db_insetter(vector_db: Any, image_summaries_texts: List[str], image_path: str, pdf_name: str, page_no: int, extra_metadata: Optional[dict] = None) -> None:
     if not image_summaries_texts:
         raise ValueError("The image summaries list cannot be empty.")
     if page_no < 1:
@@ -16,51 +41,261 @@ def image_db_insetter(vector_db: Any, image_summaries_texts: List[str], image_pa
             "Source": os.path.basename(pdf_name),
             "PageNo": page_no,
             "ImagePath": image_path,
-            "Type": "Image"
+            "Type": "Image",
+            **(extra_metadata or {})
         }))
     
     try:
-        vector_db.add_documents(documents=documents)
+        add_chunks(vector_db, documents)
     except Exception as e:
         raise Exception(f"An error occurred while adding documents to the vector database: {e}")
 
-def text_db_insetter(vector_db: Any, texts: List[str], pdf_name: str, page_no: int) -> None:
+def text_db_insetter(vector_db: Any, texts: List[str], pdf_name: str, page_no: int, extra_metadata: Optional[dict] = None) -> None:
     if not texts:
         raise ValueError("The texts list cannot be empty.")
     if page_no < 1:
         raise ValueError("Page number must be a positive integer.")
     
+    source = os.path.basename(pdf_name)
+    duplicate_index = get_duplicate_index()
+    adjacency_index = get_adjacency_index()
+    start_offset = adjacency_index.next_offset(source, page_no) if adjacency_index is not None else None
+    documents = {}
+    signatures = {}
+    # Chunk ids in reading order, including near-duplicates stored under an earlier chunk's id
+    sequence = []
+    occurrences = []
+    for offset, text in enumerate(texts):
+        metadata = {
+            "Source": source,
+            "PageNo": page_no,
+            "Type": "Text",
+            **(extra_metadata or {})
+        }
+        if adjacency_index is not None:
+            metadata["ChunkOffset"] = start_offset + offset
+        if duplicate_index is None:
+            chunk_id = str(uuid.uuid4()) if adjacency_index is not None else len(documents)
+            documents[chunk_id] = Document(page_content=text, metadata=metadata)
+            sequence.append(chunk_id)
+            continue
+
+        # Near-duplicates are stored once; where else they occur is kept in the index, not in Chroma
+        signature = duplicate_index.signature(text)
+        duplicate_id = duplicate_index.find_duplicate(signature, signatures)
+        if duplicate_id is not None:
+            sequence.append(duplicate_id)
+        else:
+            chunk_id = str(uuid.uuid4())
+            # Retrieved Documents carry no id, so references look occurrences up by this one
+            metadata["ChunkId"] = chunk_id
+            documents[chunk_id] = Document(page_content=text, metadata=metadata)
+            signatures[chunk_id] = signature
+            sequence.append(chunk_id)
+        occurrences.append((sequence[-1], source, page_no))
+
+    if documents:
+        try:
+            if duplicate_index is None and adjacency_index is None:
+                add_chunks(vector_db, list(documents.values()))
+            else:
+                add_chunks(vector_db, list(documents.values()), ids=list(documents.keys()))
+        except Exception as e:
+            raise Exception(f"An error occurred while adding documents to the vector database: {e}")
+
+        if duplicate_index is not None:
+            duplicate_index.add(signatures)
+    else:
+        logger.info("All %d chunks of %s page %d were near-duplicates of indexed chunks", len(texts), source, page_no)
+
+    if duplicate_index is not None:
+        duplicate_index.add_occurrences(occurrences)
+
+    if adjacency_index is not None:
+        adjacency_index.append(source, page_no, start_offset, sequence)
+
+def update_chunk_metadata(vector_db: Any, ids: List[str], metadatas: List[dict]) -> None:
+    if hasattr(vector_db, "update_metadata"):
+        vector_db.update_metadata(ids=ids, metadatas=metadatas)
+    else:
+        vector_db._collection.update(ids=ids, metadatas=metadatas)
+
+def table_db_insetter(vector_db: Any, tables: List[str], pdf_name: str, page_no: int) -> None:
+    if not tables:
+        raise ValueError("The tables list cannot be empty.")
+    if page_no < 1:
+        raise ValueError("Page number must be a positive integer.")
+    
     documents = []
-    for text in texts:
-        documents.append(Document(page_content=text, metadata={
+    for table in tables:
+        documents.append(Document(page_content=table, metadata={
             "Source": os.path.basename(pdf_name),
             "PageNo": page_no,
-            "Type": "Text"
+            "Type": "Table"
         }))
     
     try:
-        vector_db.add_documents(documents=documents)
+        add_chunks(vector_db, documents)
     except Exception as e:
         raise Exception(f"An error occurred while adding documents to the vector database: {e}")
 
-def create_retriever(vector_db: Any, search_type: str, top_k: int) -> Any:
+def delete_source_chunks(vector_db: Any, source_name: str) -> int:
+    source_name = os.path.basename(source_name)
+    try:
+        existing = vector_db.get(where={"Source": source_name})
+        adjacency_index = get_adjacency_index()
+        duplicate_index = get_duplicate_index()
+        metadata_by_id = dict(zip(existing["ids"], existing["metadatas"]))
+
+        # Deduplicated chunks owned by another source may still occur in this one
+        remaining_by_id = duplicate_index.remove_source(source_name) if duplicate_index is not None else {}
+        cited_elsewhere = [chunk_id for chunk_id in remaining_by_id if chunk_id not in metadata_by_id]
+        if cited_elsewhere:
+            cited = vector_db.get(ids=cited_elsewhere)
+            metadata_by_id.update(zip(cited["ids"], cited["metadatas"]))
+
+        ids = []
+        for chunk_id, metadata in metadata_by_id.items():
+            if chunk_id in remaining_by_id:
+                remaining = remaining_by_id[chunk_id]
+            else:
+                # Chunks indexed before occurrences moved to the index list them in their metadata
+                remaining = [occurrence for occurrence in json.loads(metadata.get("Occurrences") or "[]")
+                             if occurrence["pdf_name"] != source_name]
+            if not remaining:
+                ids.append(chunk_id)
+                continue
+
+            # Chunks that also occur in other sources are re-homed instead of deleted
+            updated = dict(metadata)
+            if "Occurrences" in metadata:
+                updated["Occurrences"] = json.dumps(remaining)
+            if {"pdf_name": metadata.get("Source"), "page_no": metadata.get("PageNo")} not in remaining:
+                updated["Source"] = remaining[0]["pdf_name"]
+                updated["PageNo"] = remaining[0]["page_no"]
+                if adjacency_index is not None and "ChunkOffset" in metadata:
+                    offset = adjacency_index.offset_of(remaining[0]["pdf_name"], remaining[0]["page_no"], chunk_id)
+                    updated["ChunkOffset"] = offset if offset is not None else -1
+            if updated != metadata:
+                update_chunk_metadata(vector_db, [chunk_id], [updated])
+
+        if adjacency_index is not None:
+            adjacency_index.remove_source(source_name)
+        if ids:
+            vector_db.delete(ids=ids)
+            if duplicate_index is not None:
+                duplicate_index.remove(ids)
+            text_store = get_text_store()
+            if text_store is not None:
+                text_store.delete_many(ids)
+    except Exception as e:
+        raise Exception(f"An error occurred while deleting chunks of '{source_name}' from the vector database: {e}")
+    logger.info("Deleted %d chunks of source: %s", len(ids), source_name)
+    return len(ids)
+
+def create_retriever(vector_db: Any, search_type: str, top_k: int, score_threshold: Optional[float] = None) -> Any:
     # Validate the search_type
     valid_search_types = ['similarity', 'similarity_score_threshold', 'mmr']
     if search_type not in valid_search_types:
         raise ValueError(f"Invalid search_type '{search_type}'. Valid values are: {valid_search_types}")
     
-    retriever = vector_db.as_retriever(search_type=search_type, search_kwargs={"k": top_k})
+    search_kwargs = {"k": top_k}
+    if search_type == 'similarity_score_threshold' and score_threshold is not None:
+        search_kwargs["score_threshold"] = score_threshold
+    retriever = vector_db.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
     return retriever
 
-def retrieve_documents(retriever: Any, question: str) -> List[Document]:
+def retrieve_documents(retriever: Any, question: str, image_resolver: Optional[Any] = None) -> List[Document]:
     if not question or not isinstance(question, str):
         logger.error("Invalid question provided: %s", question)
         raise ValueError("The question must be a non-empty string.")
     
     try:
         results = retriever.invoke(input=question)
+        if image_resolver is not None:
+            # Summarize images indexed lazily on the pages that were just retrieved
+            results = image_resolver.resolve(results)
         logger.info("Retrieved %d documents for question: %s", len(results), question)
         return results
     except Exception as e:
         logger.error("Error retrieving documents: %s", str(e))
         return []
+
+def retrieve_chunk_records(vector_db: Any, question: str, top_k: int) -> List[ChunkRecord]:
+    if not question or not isinstance(question, str):
+        logger.error("Invalid question provided: %s", question)
+        raise ValueError("The question must be a non-empty string.")
+
+    text_store = get_text_store()
+    if text_store is None:
+        raise ValueError("Chunk records require the text store to be enabled in config.json.")
+
+    try:
+        query_embedding = vector_db.embeddings.embed_query(question)
+        # Only ids, metadata and scores come back; text is pulled from the side store on demand
+        results = vector_db._collection.query(query_embeddings=[query_embedding], n_results=top_k,
+                                              include=["metadatas", "distances"])
+        # Chunks indexed before the text store was enabled have no text there yet; backfill it from Chroma
+        missing = text_store.missing(results["ids"][0])
+        if missing:
+            backfill = vector_db._collection.get(ids=missing, include=["documents"])
+            text_store.put_many(zip(backfill["ids"], backfill["documents"]))
+            logger.info("Backfilled %d chunks into the text store", len(backfill["ids"]))
+        records = [
+            ChunkRecord(chunk_id, metadata or {}, distance, text_store)
+            for chunk_id, metadata, distance in zip(results["ids"][0], results["metadatas"][0], results["distances"][0])
+        ]
+        logger.info("Retrieved %d chunk records for question: %s", len(records), question)
+        return records
+    except Exception as e:
+        logger.error("Error retrieving chunk records: %s", str(e))
+        return []
+
+def embed_queries(embeddings: Any, questions: List[str]) -> List[List[float]]:
+    # One batched forward pass for all questions. For symmetric models (e.g. all-MiniLM) embed_query
+    # is the same computation; models with a query instruction (e.g. bge) get it prefixed here
+    query_instruction = getattr(embeddings, "query_instruction", None)
+    if query_instruction and getattr(embeddings, "embed_instruction", None):
+        # Instructor models pair every text with an instruction inside embed_documents itself
+        return [embeddings.embed_query(question) for question in questions]
+    if query_instruction:
+        questions = [query_instruction + question for question in questions]
+    return embeddings.embed_documents(questions)
+
+def query_collection_batch(collection: Any, query_embeddings: List[List[float]], top_k: int, documents_by_id: Dict[str, Document]) -> List[List[Tuple[Document, float]]]:
+    # One query call scores every question embedding against the index at once
+    results = collection.query(query_embeddings=query_embeddings, n_results=top_k,
+                               include=["documents", "metadatas", "distances"])
+    batched_hits = []
+    for ids, texts, metadatas, distances in zip(results["ids"], results["documents"], results["metadatas"], results["distances"]):
+        hits = []
+        for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances):
+            # Chunks hit by several questions share a single Document object
+            if chunk_id not in documents_by_id:
+                documents_by_id[chunk_id] = Document(page_content=text, metadata=metadata or {})
+            hits.append((documents_by_id[chunk_id], distance))
+        batched_hits.append(hits)
+    return batched_hits
+
+def retrieve_documents_batch(vector_db: Any, questions: List[str], top_k: int) -> List[List[Document]]:
+    if not questions or not all(question and isinstance(question, str) for question in questions):
+        logger.error("Invalid questions provided: %s", questions)
+        raise ValueError("The questions must be a non-empty list of non-empty strings.")
+
+    # Repeated questions are embedded and searched only once
+    unique_questions = list(dict.fromkeys(questions))
+
+    try:
+        if hasattr(vector_db, "search_batch"):
+            results = vector_db.search_batch(unique_questions, top_k)
+        else:
+            query_embeddings = embed_queries(vector_db.embeddings, unique_questions)
+            batched_hits = query_collection_batch(vector_db._collection, query_embeddings, top_k, {})
+            results = [[document for document, _ in hits] for hits in batched_hits]
+    except Exception as e:
+        logger.error("Error retrieving documents in batch: %s", str(e))
+        return [[] for _ in questions]
+
+    results_by_question = dict(zip(unique_questions, results))
+    logger.info("Retrieved documents for %d questions (%d unique) in one batch", len(questions), len(unique_questions))
+    return [results_by_question[question] for question in questions]
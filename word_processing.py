@@ -1,48 +1,244 @@
+import multiprocessing
 import os
-from typing import Any
-from langchain_community.document_loaders import Docx2txtLoader
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from logging_config import logger
-from vector_database import text_db_insetter
-from utilities import text_splitter
+from vector_database import text_db_insetter, image_db_insetter
+from image_processing import encode_image_base64, cached_image_summary
+from utilities import text_splitter, config
+from work_scheduler import work_slot
 
-def word_text_extracter(file_path: str) -> str:
-    """Extracts and cleans text from a Word document.
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# In OOXML, outline level 9 marks body text; 0-8 are heading levels 1-9
+BODY_TEXT_OUTLINE_LEVEL = 9
+
+def _paragraph_styles(docx: zipfile.ZipFile) -> Dict[str, Tuple[str, Optional[int]]]:
+    """Maps paragraph style ids to their display names and outline levels from word/styles.xml."""
+    if "word/styles.xml" not in docx.namelist():
+        return {}
+    root = ET.fromstring(docx.read("word/styles.xml"))
+    styles = {}
+    for style in root.iter(f"{{{W_NS}}}style"):
+        name = style.find(f"{{{W_NS}}}name")
+        outline = style.find(f"{{{W_NS}}}pPr/{{{W_NS}}}outlineLvl")
+        styles[style.get(f"{{{W_NS}}}styleId")] = (
+            name.get(f"{{{W_NS}}}val", "") if name is not None else "",
+            int(outline.get(f"{{{W_NS}}}val", "0")) if outline is not None else None,
+        )
+    return styles
+
+def _image_targets(docx: zipfile.ZipFile) -> Dict[str, str]:
+    """Maps relationship ids to the archive paths of embedded images."""
+    rels_path = "word/_rels/document.xml.rels"
+    if rels_path not in docx.namelist():
+        return {}
+    root = ET.fromstring(docx.read(rels_path))
+    targets = {}
+    for rel in root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("Type", "").endswith("/image") and rel.get("TargetMode") != "External":
+            targets[rel.get("Id")] = posixpath.normpath(posixpath.join("word", rel.get("Target")))
+    return targets
+
+def _outline_heading_level(outline_level: int) -> Optional[int]:
+    return None if outline_level >= BODY_TEXT_OUTLINE_LEVEL else outline_level + 1
+
+def _heading_level(paragraph: ET.Element, styles: Dict[str, Tuple[str, Optional[int]]]) -> Optional[int]:
+    """Returns the heading level of a paragraph (0 for a title), or None for body text."""
+    properties = paragraph.find(f"{{{W_NS}}}pPr")
+    if properties is None:
+        return None
+
+    # A direct outline level overrides the one defined on the paragraph style
+    outline = properties.find(f"{{{W_NS}}}outlineLvl")
+    if outline is not None:
+        return _outline_heading_level(int(outline.get(f"{{{W_NS}}}val", "0")))
+
+    style = properties.find(f"{{{W_NS}}}pStyle")
+    if style is None:
+        return None
+    style_id = style.get(f"{{{W_NS}}}val", "")
+    style_name, style_outline = styles.get(style_id, (style_id, None))
+    if style_outline is not None:
+        return _outline_heading_level(style_outline)
+    style_name = (style_name or style_id).lower().replace(" ", "")
+    if style_name == "title":
+        return 0
+    match = re.fullmatch(r"heading(\d)", style_name)
+    return int(match.group(1)) if match else None
+
+def iter_word_paragraphs(file_path: str) -> Iterator[Tuple[Optional[int], str, List[str]]]:
+    """Streams the paragraphs of a Word document without loading the whole body into memory.
+
+    Args:
+        file_path (str): The path to the Word document.
+
+    Yields:
+        Tuple[Optional[int], str, List[str]]: The heading level (None for body text), the paragraph
+        text, and the archive paths of any images embedded in the paragraph.
+    """
+    with zipfile.ZipFile(file_path) as docx:
+        styles = _paragraph_styles(docx)
+        image_targets = _image_targets(docx)
+
+        with docx.open("word/document.xml") as document_xml:
+            depth = 0
+            for event, element in ET.iterparse(document_xml, events=("start", "end")):
+                if element.tag != f"{{{W_NS}}}p":
+                    continue
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth:
+                    # Nested paragraphs (e.g. in text boxes) are emitted with their outer paragraph
+                    continue
+
+                text = "".join(node.text or "" for node in element.iter(f"{{{W_NS}}}t"))
+                images = [
+                    image_targets[blip.get(f"{{{R_NS}}}embed")]
+                    for blip in element.iter(f"{{{A_NS}}}blip")
+                    if blip.get(f"{{{R_NS}}}embed") in image_targets
+                ]
+                yield _heading_level(element, styles), text.strip(), images
+                element.clear()
+
+def extract_word_sections(file_path: str) -> Tuple[List[Dict[str, Any]], Dict[str, bytes]]:
+    """Splits a Word document into sections keyed by their heading path.
 
     Args:
         file_path (str): The path to the Word document.
 
     Returns:
-        str: Cleaned text extracted from the document.
+        Tuple[List[Dict[str, Any]], Dict[str, bytes]]: A tuple containing:
+            - sections: Dicts with "heading_path" (List[str]), "text" (str, starting with the section's
+              heading so the heading itself is searchable) and "images" (List[str]).
+            - images: A mapping of archive image path to image bytes.
 
     Raises:
         FileNotFoundError: If the specified file does not exist.
-        Exception: If there is an error loading the document.
+        Exception: If there is an error reading the document.
     """
     if not os.path.isfile(file_path):
         raise FileNotFoundError(f"The specified file does not exist: {file_path}")
 
     try:
-        loader = Docx2txtLoader(file_path)
-        data = loader.load()
-        
-        # Extract the page content
-        page_content = data[0].page_content
-        
-        # Remove unwanted newline characters
-        cleaned_content = page_content.replace('\n', ' ')
-        
-        return cleaned_content
+        headings = []
+        sections = [{"heading_path": [], "heading": None, "text": [], "images": []}]
+        for level, text, images in iter_word_paragraphs(file_path):
+            if level is not None and text:
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, text))
+                sections.append({"heading_path": [heading for _, heading in headings], "heading": text, "text": [], "images": []})
+            elif text:
+                sections[-1]["text"].append(text)
+            sections[-1]["images"].extend(images)
+
+        image_paths = {path for section in sections for path in section["images"]}
+        with zipfile.ZipFile(file_path) as docx:
+            image_bytes = {path: docx.read(path) for path in image_paths}
     except Exception as e:
         logger.error(f"Error loading document: '{file_path}'. Error: {e}")
         raise Exception(f"Failed to extract text from Word document: '{file_path}'.") from e
 
-def process_word_text(word_path: str, vector_db: Any, text_chunker: Any) -> None:
-    """Processes a Word document by extracting text, chunking it, and inserting it into a vector database.
+    sections = [
+        {
+            "heading_path": section["heading_path"],
+            "text": " ".join(([section["heading"]] if section["heading"] else []) + section["text"]),
+            "images": section["images"],
+        }
+        for section in sections if section["text"] or section["images"]
+    ]
+    return sections, image_bytes
+
+def word_text_extracter(file_path: str) -> str:
+    """Extracts and cleans text from a Word document.
+
+    Args:
+        file_path (str): The path to the Word document.
+
+    Returns:
+        str: Cleaned text extracted from the document.
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist.
+        Exception: If there is an error loading the document.
+    """
+    sections, _ = extract_word_sections(file_path)
+    return " ".join(section["text"] for section in sections if section["text"])
+
+def word_image_processor(word_path: str, sections: List[Dict[str, Any]], image_bytes: Dict[str, bytes], output_folder: str, vector_db: Any, openai_client: Any, model_name: str, text_chunker: Any) -> None:
+    """Saves the images embedded in a Word document, summarizes them, and inserts the summaries into a vector database.
+
+    Args:
+        word_path (str): The path to the Word document.
+        sections (List[Dict[str, Any]]): The sections returned by extract_word_sections.
+        image_bytes (Dict[str, bytes]): The image bytes returned by extract_word_sections.
+        output_folder (str): The folder where extracted images will be saved.
+        vector_db (Any): An instance of the vector database to which documents will be added.
+        openai_client (Any): An instance of the OpenAI client to interact with the API.
+        model_name (str): The name of the OpenAI model to use for generating summaries.
+        text_chunker (Any): An instance of the text splitter to use for splitting text summaries.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    file_name = os.path.basename(word_path)
+
+    for section in sections:
+        heading_path = " > ".join(section["heading_path"])
+        for image_path in section["images"]:
+            image_filename = f"{output_folder}/{file_name}_{posixpath.basename(image_path)}"
+            try:
+                with open(image_filename, "wb") as image_file:
+                    image_file.write(image_bytes[image_path])
+                logger.info(f"Saved image: {image_filename}")
+
+                encoded_image = encode_image_base64(image_filename)
+                image_summary = cached_image_summary(encoded_image, model_name, openai_client)
+                split_summaries = text_splitter(image_summary, text_chunker)
+                image_db_insetter(vector_db, split_summaries, image_filename, file_name, page_no=1,
+                                  extra_metadata={"HeadingPath": heading_path})
+                logger.info(f"Successfully inserted image summary chunks into vector database for image: {image_filename}")
+            except Exception as e:
+                logger.error(f"Error processing image '{image_path}' of Word document: '{word_path}'. Error: {e}")
+
+def insert_word_sections(word_path: str, sections: List[Dict[str, Any]], vector_db: Any, text_chunker: Any) -> None:
+    """Chunks each section of a Word document and inserts it with its heading path as metadata.
+
+    Args:
+        word_path (str): The path to the Word document.
+        sections (List[Dict[str, Any]]): The sections returned by extract_word_sections.
+        vector_db (Any): An instance of the vector database to which documents will be added.
+        text_chunker (Any): An instance of the text splitter to use for splitting the text.
+    """
+    file_name = os.path.basename(word_path)
+    for section in sections:
+        if not section["text"]:
+            continue
+        split_texts = text_splitter(text=section["text"], text_chunker=text_chunker)
+        text_db_insetter(vector_db=vector_db, texts=split_texts, pdf_name=file_name, page_no=1,
+                         extra_metadata={"HeadingPath": " > ".join(section["heading_path"])})
+
+def process_word_text(word_path: str, vector_db: Any, text_chunker: Any, output_folder: Optional[str] = None, openai_client: Any = None, model_name: Optional[str] = None, extracted: Optional[Tuple[List[Dict[str, Any]], Dict[str, bytes]]] = None) -> None:
+    """Processes a Word document by extracting its sections, chunking them, and inserting them into a vector database.
+
+    Embedded images are summarized and inserted as well when an output folder and OpenAI client are given.
 
     Args:
         word_path (str): The path to the Word document.
         vector_db (Any): An instance of the vector database to which documents will be added.
         text_chunker (Any): An instance of the text splitter to use for splitting the text.
+        output_folder (Optional[str]): The folder where extracted images will be saved.
+        openai_client (Any): An instance of the OpenAI client used to summarize embedded images.
+        model_name (Optional[str]): The name of the OpenAI model to use for image summaries.
+        extracted (Optional[Tuple]): The result of extract_word_sections, if the document was already parsed.
 
     Raises:
         ValueError: If the Word path is empty or invalid.
@@ -54,20 +250,48 @@ def process_word_text(word_path: str, vector_db: Any, text_chunker: Any) -> None
     logger.info(f"Processing Word document: '{word_path}'")
 
     try:
-        # Extract text from the Word document
-        extracted_text = word_text_extracter(word_path)
+        sections, image_bytes = extracted or extract_word_sections(word_path)
 
-        split_texts = text_splitter(text=extracted_text,text_chunker=text_chunker)
+        insert_word_sections(word_path, sections, vector_db, text_chunker)
 
-        # Extract the file name from the path
-        file_name = os.path.basename(word_path)
+        if image_bytes and output_folder and openai_client is not None:
+            word_image_processor(word_path, sections, image_bytes, output_folder, vector_db, openai_client, model_name, text_chunker)
 
-        text_db_insetter(vector_db=vector_db, texts=split_texts, pdf_name=file_name, page_no=1)
-        logger.info(f"Successfully processed and inserted chunks from '{file_name}' into the vector database.")
+        logger.info(f"Successfully processed and inserted chunks from '{os.path.basename(word_path)}' into the vector database.")
 
     except ValueError as ve:
         logger.error(f"Value error while processing Word document: '{word_path}'. Error: {ve}")
         raise
     except Exception as e:
         logger.error(f"Error processing Word document: '{word_path}'. Error: {e}")
-        raise Exception(f"Failed to process Word document: '{word_path}'.") from e
\ No newline at end of file
+        raise Exception(f"Failed to process Word document: '{word_path}'.") from e
+
+def process_word_files(word_paths: List[str], vector_db: Any, text_chunker: Any, output_folder: Optional[str] = None, openai_client: Any = None, model_name: Optional[str] = None) -> None:
+    """Processes many Word documents, parsing them in parallel in a process pool.
+
+    Parsing is CPU-bound and runs in worker processes; insertion into the vector database and image
+    summarization happen in the calling process as each document finishes parsing.
+
+    Args:
+        word_paths (List[str]): The paths to the Word documents.
+        vector_db (Any): An instance of the vector database to which documents will be added.
+        text_chunker (Any): An instance of the text splitter to use for splitting the text.
+        output_folder (Optional[str]): The folder where extracted images will be saved.
+        openai_client (Any): An instance of the OpenAI client used to summarize embedded images.
+        model_name (Optional[str]): The name of the OpenAI model to use for image summaries.
+    """
+    if not word_paths:
+        return
+
+    max_workers = config["settings"].get("max_word_workers") or os.cpu_count()
+    # Spawned, not forked: callers (the watch-mode timer, the sharded store) run other threads
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(word_paths)), mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(extract_word_sections, path): path for path in word_paths}
+        for future in as_completed(futures):
+            word_path = futures[future]
+            try:
+                with work_slot("ingest"):
+                    process_word_text(word_path, vector_db, text_chunker, output_folder, openai_client, model_name,
+                                      extracted=future.result())
+            except Exception as e:
+                logger.error(f"Error processing {os.path.basename(word_path)}: {e}")
@@ -0,0 +1,268 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+from logging_config import logger
+from utilities import config_section, shared_if_enabled
+
+scheduler_config = config_section("scheduler")
+
+# Highest priority first
+PRIORITY_CLASSES = ("interactive", "batch", "ingest")
+# Where the measured interactive latency ends: after retrieval, or when the answer is ready
+LATENCY_SPANS = ("retrieval", "total")
+
+
+class SlotTicket:
+    """
+    Handle for a held slot. An interactive slot records the query latency from arrival (so queueing
+    counts) up to `mark()`, or up to the end of the slot if it is never marked.
+    """
+
+    def __init__(self, scheduler: Optional["WorkScheduler"] = None, arrived: float = 0.0, record: bool = False):
+        self.scheduler = scheduler
+        self.arrived = arrived
+        self.record = record
+
+    def mark(self) -> None:
+        if self.record:
+            self.record = False
+            self.scheduler.record_query_latency(time.monotonic() - self.arrived)
+
+
+class WorkScheduler:
+    """
+    Shares the host (LLM quota, CPU and the vector store) between interactive queries, batch QA
+    and background ingestion.
+
+    Each priority class has its own concurrency limit and request rate (a token bucket). Lower
+    classes do not start new work while a higher class is waiting for a slot, and ingestion is
+    throttled, then paused, while the p95 latency of recent interactive queries is above target.
+
+    Slots are re-entrant per thread: a file-level ingest job holds one slot, and the LLM calls and
+    vector store writes inside it only wait for their class to be admitted (and take a rate token)
+    without counting against concurrency again. That makes them the points where a running
+    ingest job pauses.
+    """
+
+    def __init__(self, class_limits: Dict[str, Dict[str, Any]], latency_target_seconds: float,
+                 latency_window_seconds: float = 60.0, throttled_ingest_concurrency: int = 1, pause_factor: float = 2.0,
+                 latency_span: str = "retrieval"):
+        unknown = set(class_limits) - set(PRIORITY_CLASSES)
+        if unknown:
+            raise ValueError(f"Unknown priority classes: {sorted(unknown)}. Valid values are: {list(PRIORITY_CLASSES)}")
+        if latency_span not in LATENCY_SPANS:
+            raise ValueError(f"Invalid latency span '{latency_span}'. Valid values are: {list(LATENCY_SPANS)}")
+
+        self.class_limits = {name: class_limits.get(name, {}) for name in PRIORITY_CLASSES}
+        self.latency_target_seconds = latency_target_seconds
+        self.latency_window_seconds = latency_window_seconds
+        self.throttled_ingest_concurrency = throttled_ingest_concurrency
+        self.pause_factor = pause_factor
+        self.latency_span = latency_span
+
+        self.running = {name: 0 for name in PRIORITY_CLASSES}
+        self.waiting = {name: 0 for name in PRIORITY_CLASSES}
+        self.tokens = {name: self._burst(name) for name in PRIORITY_CLASSES}
+        self.refilled_at = {name: time.monotonic() for name in PRIORITY_CLASSES}
+        self.query_latencies = deque()
+        self.ingest_state = "normal"
+        self._condition = threading.Condition()
+        self._held = threading.local()
+
+    def _burst(self, name: str) -> float:
+        limits = self.class_limits[name]
+        return float(limits.get("burst", limits.get("concurrency", 1)))
+
+    def _query_p95(self, now: float) -> float:
+        while self.query_latencies and now - self.query_latencies[0][0] > self.latency_window_seconds:
+            self.query_latencies.popleft()
+        if not self.query_latencies:
+            return 0.0
+        latencies = sorted(latency for _, latency in self.query_latencies)
+        return latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+
+    def _concurrency_limit(self, name: str, now: float) -> int:
+        limit = self.class_limits[name].get("concurrency", 1)
+        if name != "ingest" or not self.latency_target_seconds:
+            return limit
+
+        p95 = self._query_p95(now)
+        if p95 > self.latency_target_seconds * self.pause_factor:
+            state, limit = "paused", 0
+        elif p95 > self.latency_target_seconds:
+            state, limit = "throttled", min(limit, self.throttled_ingest_concurrency)
+        else:
+            state = "normal"
+        if state != self.ingest_state:
+            logger.info(f"Ingestion {state}: query p95 latency {p95:.2f}s, target {self.latency_target_seconds:.2f}s")
+            self.ingest_state = state
+        return limit
+
+    def _take_token(self, name: str, now: float) -> float:
+        # Returns 0 if a request token was taken, otherwise the seconds until one is available
+        rate_per_minute = self.class_limits[name].get("requests_per_minute")
+        if not rate_per_minute:
+            return 0.0
+        rate = rate_per_minute / 60.0
+        self.tokens[name] = min(self._burst(name), self.tokens[name] + (now - self.refilled_at[name]) * rate)
+        self.refilled_at[name] = now
+        if self.tokens[name] >= 1:
+            self.tokens[name] -= 1
+            return 0.0
+        return (1 - self.tokens[name]) / rate
+
+    def _higher_class_waiting(self, name: str) -> bool:
+        return any(self.waiting[higher] for higher in PRIORITY_CLASSES[:PRIORITY_CLASSES.index(name)])
+
+    def _held_classes(self) -> list:
+        if not hasattr(self._held, "classes"):
+            self._held.classes = []
+        return self._held.classes
+
+    def _admitted(self, priority: str, now: float, nested: bool) -> bool:
+        if self._higher_class_waiting(priority):
+            return False
+        if nested:
+            # The slot is already counted; only a paused class holds its running jobs back
+            return self._concurrency_limit(priority, now) > 0
+        return self.running[priority] < self._concurrency_limit(priority, now)
+
+    def _wait_for_admission(self, priority: str, nested: bool, take_token: bool) -> None:
+        # Must be called with the condition held
+        while True:
+            now = time.monotonic()
+            if self._admitted(priority, now, nested):
+                wait = self._take_token(priority, now) if take_token else 0.0
+                if not wait:
+                    return
+                self._condition.wait(timeout=wait)
+            else:
+                # Latency samples age out of the window, so re-check a paused class periodically
+                self._condition.wait(timeout=1.0)
+
+    @contextmanager
+    def slot(self, priority: str) -> Iterator[SlotTicket]:
+        """
+        Holds a slot of a priority class for the duration of the block, waiting until one is free.
+
+        Args:
+            priority (str): One of PRIORITY_CLASSES.
+
+        Yields:
+            SlotTicket: The ticket of the slot; interactive callers `mark()` it when the measured span ends.
+
+        Raises:
+            ValueError: If the priority class is unknown.
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Invalid priority '{priority}'. Valid values are: {list(PRIORITY_CLASSES)}")
+
+        arrived = time.monotonic()
+        held = self._held_classes()
+        nested = bool(held)
+        with self._condition:
+            if not nested:
+                self.waiting[priority] += 1
+            try:
+                self._wait_for_admission(priority, nested, take_token=True)
+            finally:
+                if not nested:
+                    self.waiting[priority] -= 1
+            if not nested:
+                self.running[priority] += 1
+
+        ticket = SlotTicket(self, arrived, record=priority == "interactive" and not nested)
+        held.append(priority)
+        try:
+            yield ticket
+        finally:
+            held.pop()
+            ticket.mark()
+            if not nested:
+                with self._condition:
+                    self.running[priority] -= 1
+                    self._condition.notify_all()
+
+    def checkpoint(self) -> None:
+        """
+        Waits while the class of the slot held by this thread is paused; a no-op outside a slot.
+
+        Long-running work (e.g. vector store writes during ingestion) calls this between steps so
+        that a pause takes effect before the job finishes.
+        """
+        held = self._held_classes()
+        if not held:
+            return
+        with self._condition:
+            self._wait_for_admission(held[-1], nested=True, take_token=False)
+
+    def record_query_latency(self, latency_seconds: float) -> None:
+        with self._condition:
+            self.query_latencies.append((time.monotonic(), latency_seconds))
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "running": dict(self.running),
+                "waiting": dict(self.waiting),
+                "query_p95_seconds": self._query_p95(time.monotonic()),
+                "ingest_state": self.ingest_state,
+            }
+
+
+def _create_work_scheduler() -> WorkScheduler:
+    return WorkScheduler(
+        class_limits=scheduler_config.get("classes", {}),
+        latency_target_seconds=scheduler_config.get("query_latency_target_seconds", 5.0),
+        latency_window_seconds=scheduler_config.get("latency_window_seconds", 60.0),
+        throttled_ingest_concurrency=scheduler_config.get("throttled_ingest_concurrency", 1),
+        pause_factor=scheduler_config.get("pause_factor", 2.0),
+        latency_span=scheduler_config.get("latency_span", "retrieval"),
+    )
+
+
+# The shared work scheduler, or None if it is disabled in config.json
+get_work_scheduler = shared_if_enabled(scheduler_config, _create_work_scheduler)
+
+
+def work_slot(priority: Optional[str]) -> ContextManager[SlotTicket]:
+    """
+    Returns a slot of the shared scheduler for a priority class, or a no-op context if the
+    scheduler is disabled or no priority is given (the caller already holds a slot).
+
+    Args:
+        priority (Optional[str]): One of PRIORITY_CLASSES, or None.
+
+    Returns:
+        ContextManager[SlotTicket]: The slot to hold while doing the work.
+    """
+    scheduler = get_work_scheduler()
+    if scheduler is None or priority is None:
+        return nullcontext(SlotTicket())
+    return scheduler.slot(priority)
+
+
+def work_checkpoint() -> None:
+    """
+    Pauses the calling thread while its scheduler class is paused; a no-op if the scheduler is
+    disabled or the thread holds no slot.
+    """
+    scheduler = get_work_scheduler()
+    if scheduler is not None:
+        scheduler.checkpoint()
+
+
+def measured_span_end(ticket: SlotTicket) -> None:
+    """
+    Ends the measured query latency span after retrieval, when `latency_span` is "retrieval".
+
+    Args:
+        ticket (SlotTicket): The ticket of the interactive slot.
+    """
+    scheduler = get_work_scheduler()
+    if scheduler is not None and scheduler.latency_span == "retrieval":
+        ticket.mark()